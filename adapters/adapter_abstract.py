@@ -1,16 +1,28 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Mapping
+from types import MappingProxyType
+import numpy as np
 import pandas as pd
 import json
+import hashlib
+import torch
 from torch import Tensor
 from functools import lru_cache
+from collections import OrderedDict
+from adapters.sentence_interner import get_interner
 
 import chess
+import chess.polyglot
 from chess import Board, SQUARES_180
 
 # Import piece name lookup table
 with open("./language_info/piece_names.json") as piece_name_map_file:
     PIECE_NAME_LOOKUP: Dict[str, Dict[str, str]] = json.load(piece_name_map_file)
+# Piece symbol -> (player name, piece name), '.' for empty squares
+PIECE_NAMES: Mapping[str, Tuple[str, str]] = MappingProxyType({symbol: (tuple(name.split(" ")) if name != '.' else ('.', '.'))
+                                                               for symbol, name in PIECE_NAME_LOOKUP["piece_names"].items()})
+# Square name (e.g. 'e2') -> square index (a1=0 ... h8=63)
+SQUARE_INDEX: Mapping[str, int] = MappingProxyType({name: i for i, name in enumerate(chess.SQUARE_NAMES)})
     
 PROMO_CHOICE_MAP = {
 "r": "rook",
@@ -22,12 +34,231 @@ PROMO_CHOICE_MAP = {
     
 # Import language move logic
 LOGIC_DF = pd.read_csv('./language_info/piece_logics.csv')
+# Compiled once on import: (Player, Piece, Move_dir, Move_type) -> Language template
+MOVE_LOGIC: Mapping[Tuple[str, str, str, str], str] = MappingProxyType({(r["Player"], r["Piece"], r["Move_dir"], r["Move_type"]): r["Language"]
+                                                                        for r in LOGIC_DF.to_records()})
+
+# Compact action index over every move shape possible in chess
+# - queen-line and knight moves between any two squares (includes castling as king moves e1g1 etc.)
+# - pawn promotions to knight/bishop/rook/queen from the 7th/2nd rank, straight or capturing
+# ACTION_UCI[id] -> uci string, ACTION_INDEX[uci] -> id, ACTION_MOVES[id] -> chess.Move
+# ACTION_ID_TABLE[from_square, to_square, promotion piece type or 0] -> id (-1 if not a possible move)
+def _build_action_table() -> Tuple[np.ndarray, Tuple[chess.Move], np.ndarray]:
+    moves: List[chess.Move] = []
+    for from_sq in chess.SQUARES:
+        for to_sq in chess.SQUARES:
+            if from_sq == to_sq:
+                continue
+            file_dis = abs(chess.square_file(from_sq) - chess.square_file(to_sq))
+            rank_dis = abs(chess.square_rank(from_sq) - chess.square_rank(to_sq))
+            queen_line = (file_dis == 0) or (rank_dis == 0) or (file_dis == rank_dis)
+            knight_jump = sorted([file_dis, rank_dis]) == [1, 2]
+            if queen_line or knight_jump:
+                moves.append(chess.Move(from_sq, to_sq))
+    for from_rank, to_rank in [(6, 7), (1, 0)]:
+        for from_file in range(8):
+            for to_file in [from_file-1, from_file, from_file+1]:
+                if 0 <= to_file < 8:
+                    for promotion in [chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]:
+                        moves.append(chess.Move(chess.square(from_file, from_rank), chess.square(to_file, to_rank), promotion=promotion))
+    action_uci = np.array([move.uci() for move in moves])
+    action_uci.setflags(write=False)
+    action_id_table = np.full((64, 64, 7), -1, dtype=np.int16)
+    for action_id, move in enumerate(moves):
+        action_id_table[move.from_square, move.to_square, move.promotion or 0] = action_id
+    action_id_table.setflags(write=False)
+    return action_uci, tuple(moves), action_id_table
+
+ACTION_UCI, ACTION_MOVES, ACTION_ID_TABLE = _build_action_table()
+ACTION_INDEX: Mapping[str, int] = MappingProxyType({uci: action_id for action_id, uci in enumerate(ACTION_UCI.tolist())})
+NUM_ACTIONS: int = len(ACTION_UCI)
+
+# Project-wide position key: 64-bit polyglot Zobrist hash of the position (move counters are not included)
+# - Engine.position_key keeps this up to date as moves are pushed, fen_position_key() is for positions only known by FEN
+def fen_position_key(board_fen: str) -> int:
+    """Position key of a FEN, same as Engine.position_key for that position."""
+    return chess.polyglot.zobrist_hash(Board(board_fen))
+
+# State keys: stable 64-bit key of an adapted (language) state for tabular agents
+# - blake2b of the state's sentences/symbols, so keys are the same across processes and runs (unlike hash())
+# - no Tensor is built, keys are plain ints
+STATE_KEY_SEPARATOR = '\x1f'
+def state_key(state) -> int:
+    """Stable 64-bit key of a language state (a string or a list of sentences/symbols/counts)."""
+    data = state if isinstance(state, str) else STATE_KEY_SEPARATOR.join([str(s) for s in state])
+    return int.from_bytes(hashlib.blake2b(data.encode('utf-8'), digest_size=8).digest(), 'little')
+
+# board_squares() cache: position key (or the FEN piece placement if no key is given) -> 64 character board string
+BOARD_SQUARES_CACHE_SIZE: int = 10000
+_BOARD_SQUARES: OrderedDict = OrderedDict()
+
+def move_to_action_id(move: chess.Move) -> int:
+    """Action id of a chess.Move, -1 if the move is not in the action table."""
+    return int(ACTION_ID_TABLE[move.from_square, move.to_square, move.promotion or 0])
+
+def action_ids(moves: List[chess.Move]) -> np.ndarray:
+    """Action ids of a list of chess.Move objects in one vector lookup."""
+    if len(moves) == 0:
+        return np.zeros(0, dtype=np.int16)
+    squares = np.array([(move.from_square, move.to_square, move.promotion or 0) for move in moves], dtype=np.intp)
+    return ACTION_ID_TABLE[squares[:, 0], squares[:, 1], squares[:, 2]]
     
+@lru_cache(maxsize=1)
+def _legacy_poss_actions() -> Tuple[str]:
+    """Legacy possible action list, see StateAdapter.chess_poss_actions_lst()."""
+    cols = ['a','b','c','d','e','f','g','h']
+    rows = ['1','2','3','4','5','6','7','8']
+    all_possible_actions = []
+    for c_1 in cols:
+        for r_1 in rows:
+            start = c_1+r_1
+            for c_2 in cols:
+                for r_2 in rows:
+                    end = c_2+r_2
+                    all_possible_actions.append(start+end)
+    # Pawn Promotions
+    White_promotion_codes = ['R','N','B','Q','K']
+    Black_promotion_codes = ['r','n','b','q','k']
+    for c_1 in cols:
+        for promo_code in White_promotion_codes:
+            start = c_1+'7'
+            end = c_1+'8'
+            all_possible_actions.append(start+end+promo_code)            
+        for promo_code in Black_promotion_codes:
+            start = c_1+'2'
+            end = c_1+'1'
+            all_possible_actions.append(start+end+promo_code)
+    # Pawns can go diagonal one square as well for pawn promo
+    for c in range(0,len(cols)):
+        if c==0:
+            c_1 = cols[c]
+            c_2 = cols[c+1]
+            for promo_code in White_promotion_codes:
+                start = c_1+'7'
+                end = c_2+'8'
+                all_possible_actions.append(start+end+promo_code)
+            for promo_code in Black_promotion_codes:
+                start = c_1+'2'
+                end = c_2+'1'
+                all_possible_actions.append(start+end+promo_code)
+        elif c==7:
+            c_1 = cols[c]
+            c_2 = cols[c-1]
+            for promo_code in White_promotion_codes:
+                start = c_1+'7'
+                end = c_2+'8'
+                all_possible_actions.append(start+end+promo_code)
+            for promo_code in Black_promotion_codes:
+                start = c_1+'2'
+                end = c_2+'1'
+                all_possible_actions.append(start+end+promo_code)
+        else:
+            c_1 = cols[c]
+            c_2 = cols[c-1]
+            for promo_code in White_promotion_codes:
+                start = c_1+'7'
+                end = c_2+'8'
+                all_possible_actions.append(start+end+promo_code)
+            for promo_code in Black_promotion_codes:
+                start = c_1+'2'
+                end = c_2+'1'
+                all_possible_actions.append(start+end+promo_code)
+            c_1 = cols[c]
+            c_2 = cols[c+1]
+            for promo_code in White_promotion_codes:
+                start = c_1+'7'
+                end = c_2+'8'
+                all_possible_actions.append(start+end+promo_code)
+            for promo_code in Black_promotion_codes:
+                start = c_1+'2'
+                end = c_2+'1'
+                all_possible_actions.append(start+end+promo_code)
+    return tuple(all_possible_actions)
+
 class Adapter(ABC):
     @abstractmethod
     def adapter(self, *args, **kwargs) -> List[str]:
         pass
 
+class AdaptedState:
+    """Adapted form of a single position returned by StateAdapter.adapt().
+       The language form is generated once when the state is adapted (stateful adapters advance their history here),
+       the encoded, indexed and key forms are computed from it on first access and then reused.
+       Adapters with a prebuilt encoding of the position can pass it in as encoded, either as the Tensor or
+       as a function returning it so it is only loaded if used."""
+    def __init__(self, adapter: 'StateAdapter', language, encoded: Tensor = None):
+        self.adapter = adapter
+        self.language = language
+        self._encoded: Tensor = encoded
+        self._indexed: Tensor = None
+        self._key: int = None
+
+    @property
+    def ready(self) -> bool:
+        """True if the encoded form is already available."""
+        return self._encoded is not None
+
+    @property
+    def encoded(self) -> Tensor:
+        if self._encoded is None:
+            self._encoded = self.adapter.encode(self.language)
+        elif callable(self._encoded):
+            self._encoded = self._encoded()
+        return self._encoded
+
+    @property
+    def indexed(self) -> Tensor:
+        if self._indexed is None:
+            self._indexed = self.adapter.index(self.language)
+        return self._indexed
+
+    @property
+    def key(self) -> int:
+        if self._key is None:
+            self._key = self.adapter.key(self.language)
+        return self._key
+
+class PositionContext:
+    """A position parsed once per ply and shared by the adapters that describe it (see CombinedAdapter).
+       squares: board_squares() string of the position
+       material: piece symbol -> count, in board order (a1 ... h8) of the first piece of each kind
+       moves: (uci, moving piece symbol, captured piece symbol or '.') of each legal move
+       move_descriptions: language description of each legal move, e.g. 'White pawn moves forward two spaces'
+       Material, moves and descriptions are built on first use."""
+    def __init__(self, board_fen: str, legal_moves: list = None, position_key: int = None):
+        self.board_fen = board_fen
+        self.legal_moves = legal_moves if legal_moves is not None else []
+        self.position_key = position_key
+        self.squares: str = StateAdapter.board_squares(board_fen, position_key)
+        self._material: Dict[str, int] = None
+        self._moves: List[Tuple[str, str, str]] = None
+        self._move_descriptions: List[str] = None
+
+    @property
+    def material(self) -> Dict[str, int]:
+        if self._material is None:
+            material: Dict[str, int] = {}
+            for piece_id in self.squares:
+                if piece_id != '.':
+                    material[piece_id] = material.get(piece_id, 0) + 1
+            self._material = material
+        return self._material
+
+    @property
+    def moves(self) -> List[Tuple[str, str, str]]:
+        if self._moves is None:
+            squares = self.squares
+            self._moves = [(move_uci, squares[SQUARE_INDEX[move_uci[0:2]]], squares[SQUARE_INDEX[move_uci[2:4]]])
+                           for move_uci in self.legal_moves]
+        return self._moves
+
+    @property
+    def move_descriptions(self) -> List[str]:
+        if self._move_descriptions is None:
+            self._move_descriptions = [StateAdapter.squares_move_to_lang(move_uci, piece_id, captured_id, self.board_fen)
+                                       for move_uci, piece_id, captured_id in self.moves]
+        return self._move_descriptions
+
 class StateAdapter(Adapter):  
     
     @staticmethod
@@ -38,74 +269,9 @@ class StateAdapter(Adapter):
     
     @staticmethod
     def chess_poss_actions_lst() -> List[str]:
-        cols = ['a','b','c','d','e','f','g','h']
-        rows = ['1','2','3','4','5','6','7','8']
-        all_possible_actions = []
-        for c_1 in cols:
-            for r_1 in rows:
-                start = c_1+r_1
-                for c_2 in cols:
-                    for r_2 in rows:
-                        end = c_2+r_2
-                        all_possible_actions.append(start+end)
-        # Pawn Promotions
-        White_promotion_codes = ['R','N','B','Q','K']
-        Black_promotion_codes = ['r','n','b','q','k']
-        for c_1 in cols:
-            for promo_code in White_promotion_codes:
-                start = c_1+'7'
-                end = c_1+'8'
-                all_possible_actions.append(start+end+promo_code)            
-            for promo_code in Black_promotion_codes:
-                start = c_1+'2'
-                end = c_1+'1'
-                all_possible_actions.append(start+end+promo_code)
-        # Pawns can go diagonal one square as well for pawn promo
-        for c in range(0,len(cols)):
-            if c==0:
-                c_1 = cols[c]
-                c_2 = cols[c+1]
-                for promo_code in White_promotion_codes:
-                    start = c_1+'7'
-                    end = c_2+'8'
-                    all_possible_actions.append(start+end+promo_code)
-                for promo_code in Black_promotion_codes:
-                    start = c_1+'2'
-                    end = c_2+'1'
-                    all_possible_actions.append(start+end+promo_code)
-            elif c==7:
-                c_1 = cols[c]
-                c_2 = cols[c-1]
-                for promo_code in White_promotion_codes:
-                    start = c_1+'7'
-                    end = c_2+'8'
-                    all_possible_actions.append(start+end+promo_code)
-                for promo_code in Black_promotion_codes:
-                    start = c_1+'2'
-                    end = c_2+'1'
-                    all_possible_actions.append(start+end+promo_code)
-            else:
-                c_1 = cols[c]
-                c_2 = cols[c-1]
-                for promo_code in White_promotion_codes:
-                    start = c_1+'7'
-                    end = c_2+'8'
-                    all_possible_actions.append(start+end+promo_code)
-                for promo_code in Black_promotion_codes:
-                    start = c_1+'2'
-                    end = c_2+'1'
-                    all_possible_actions.append(start+end+promo_code)
-                c_1 = cols[c]
-                c_2 = cols[c+1]
-                for promo_code in White_promotion_codes:
-                    start = c_1+'7'
-                    end = c_2+'8'
-                    all_possible_actions.append(start+end+promo_code)
-                for promo_code in Black_promotion_codes:
-                    start = c_1+'2'
-                    end = c_2+'1'
-                    all_possible_actions.append(start+end+promo_code)
-        return all_possible_actions
+        """Legacy list of possible actions (uppercase white promotion codes), built once.
+        Use ACTION_UCI/ACTION_INDEX for the compact python-chess compatible action index."""
+        return list(_legacy_poss_actions())
     
       
     @staticmethod
@@ -165,57 +331,61 @@ class StateAdapter(Adapter):
         raise AssertionError('num is too large: %s' % str(num))
 
     @staticmethod
-    @lru_cache(maxsize=10000)
+    def board_squares(board_fen: str, position_key: int = None) -> str:
+        """ Board as a 64 character string of piece symbols ('.' for empty) indexed by square (a1=0 ... h8=63).
+        Built once per position and shared by the language helpers, e.g. board_squares(fen)[SQUARE_INDEX['e2']] -> 'P'. 
+        Cached by position_key (Engine.position_key) when given, otherwise by the FEN piece placement. """
+        key = position_key if position_key is not None else board_fen.split(" ", 1)[0]
+        squares = _BOARD_SQUARES.get(key, None)
+        if squares is not None:
+            _BOARD_SQUARES.move_to_end(key)
+            return squares
+        squares = StateAdapter.fen_to_squares(board_fen)
+        _BOARD_SQUARES[key] = squares
+        if len(_BOARD_SQUARES) > BOARD_SQUARES_CACHE_SIZE:
+            _BOARD_SQUARES.popitem(last=False)
+        return squares
+
+    @staticmethod
+    def fen_to_squares(board_fen: str) -> str:
+        """ Parse the FEN piece placement into the board_squares() form. """
+        rows: List[str] = []
+        # FEN lists ranks from 8 to 1
+        for rank in reversed(board_fen.split(" ")[0].split("/")):
+            rows.append(''.join([('.'*int(c) if c.isdigit() else c) for c in rank]))
+        squares = ''.join(rows)
+        if (len(rows) != 8) or (len(squares) != 64):
+            raise ValueError(f"invalid board fen: {board_fen!r}")
+        return squares
+
+    @staticmethod
     def board_to_lang(board_fen: str):
         """ Output board us as a 2-d DataFrame with each board position and 
-        the associated descriptive chess piece where . is still used to denote empty spaces. """
-        # Board from engine needs to be flipped for White's POV
-        board_flip = Board(board_fen)
-        board_flip.apply_transform(chess.flip_vertical)
-        # Transform into 1-D list
-        board_lst = StateAdapter.compact_lst(board_flip)
-        # Connect piece to grid location, SQUARE_NAMES defines 2-d position (e.g. e2) in a single list
-        square_names_lst: List[str] = chess.SQUARE_NAMES
-        # Rename each piece to simple naming convention (e.g. 'White King')
+        the associated descriptive chess piece where . is still used to denote empty spaces. 
+        Built from board_squares() on each call, use board_squares() directly for square lookups. """
         board_df_src: List[Dict[str, str]] = list()
-        for p in range(0, len(board_lst)):
-            piece_des_name = 'init'
-            piece_id = board_lst[p]
-            board_pos = square_names_lst[p]
-            # Extract piece descriptive name from lookup
-            piece_des_name = PIECE_NAME_LOOKUP["piece_names"][piece_id]
-            # Error handling if piece name is not overridden
-            if (piece_des_name == 'init'):
-                print("ERROR: board_to_lang_df function not mapping all pieces to names")
-                print(piece_id)
-            else:
-                if piece_des_name != '.':
-                    row = {"board_pos": board_pos, "player_name":piece_des_name.split(" ")[0] , "piece_id": piece_id, "piece_des_name": piece_des_name.split(" ")[1]}
-                else:
-                    row = {"board_pos": board_pos, "player_name":'.' , "piece_id":'.', "piece_des_name": '.'}
-                board_df_src.append(row)
+        for board_pos, piece_id in zip(chess.SQUARE_NAMES, StateAdapter.board_squares(board_fen)):
+            player_name, piece_des_name = PIECE_NAMES[piece_id]
+            board_df_src.append({"board_pos": board_pos, "player_name": player_name, "piece_id": piece_id, "piece_des_name": piece_des_name})
         return board_df_src
 
     @staticmethod
     def board_pos2piece_nm(board_fen:str, start_pos:str):
-        piece_nm = 'init'
-        # Find piece name based on current board configuration extracted in Language from board_to_lang
-        board_current_lang = StateAdapter.board_to_lang(board_fen)
-        for piece in reversed(board_current_lang):
-            if (piece["board_pos"] == start_pos):
-                if piece['player_name']=='.':
-                    print("ERROR: Player Name not found for start pos - ", start_pos)
-                    print(" ")
-                    print(board_fen)
-                piece_nm = piece["player_name"] + ' ' + piece["piece_des_name"]
-                break
-        return piece_nm
+        # Find piece name based on current board configuration
+        if start_pos not in SQUARE_INDEX:
+            return 'init'
+        player_name, piece_des_name = PIECE_NAMES[StateAdapter.board_squares(board_fen)[SQUARE_INDEX[start_pos]]]
+        if player_name=='.':
+            print("ERROR: Player Name not found for start pos - ", start_pos)
+            print(" ")
+            print(board_fen)
+        return player_name + ' ' + piece_des_name
 
     @staticmethod
-    def uci_to_lang_action(move_uci: str, board_fen: str):
+    def piece_lang_action(piece_nm: str, move_uci: str) -> str:
+        """Language action for a piece name (e.g. 'White Pawn') and a uci move."""
         start_pos = move_uci[0:2]
         end_pos = move_uci[2:4]
-        piece_nm = StateAdapter.board_pos2piece_nm(board_fen, start_pos)
         # Create Language based action based on piece name and start -> end grid position
         # - Pawn promo
         if (piece_nm != ".") and (piece_nm[6:]=='Pawn') and ((end_pos[1]=='8') or (end_pos[1]=='1')):
@@ -227,17 +397,48 @@ class StateAdapter(Adapter):
             # Standard pawn promotion
             else: 
                 lang_action = str(piece_nm) + ' at ' + str(start_pos) + ' promoted to a ' + str(promotion_piece) 
-        # - Other unknown moves, e.g. castling
-        elif piece_nm == 'init':
-            print("Error: Invalid move_uci, no piece name can be found")
-            print("Input uci:", move_uci)
-            print(Board(board_fen))
-            lang_action = "ERROR"
         # - Most moves
         else:
             lang_action = str(piece_nm) + " from " + str(start_pos) + " to " + str(end_pos)
         return lang_action
-        
+
+    @staticmethod
+    def uci_to_lang_action(move_uci: str, board_fen: str):
+        piece_nm = StateAdapter.board_pos2piece_nm(board_fen, move_uci[0:2])
+        # - Other unknown moves, e.g. castling
+        if piece_nm == 'init':
+            print("Error: Invalid move_uci, no piece name can be found")
+            print("Input uci:", move_uci)
+            print(Board(board_fen))
+            return "ERROR"
+        return StateAdapter.piece_lang_action(piece_nm, move_uci)
+
+    @staticmethod
+    def move_to_lang(move_uci: str, board_fen: str, position_key: int = None) -> str:
+        """Single lookup for uci_to_lang_action + action_to_lang, 
+        e.g. 'e2e4' -> 'White pawn moves forward two spaces'."""
+        squares = StateAdapter.board_squares(board_fen, position_key)
+        return StateAdapter.squares_move_to_lang(move_uci, squares[SQUARE_INDEX[move_uci[0:2]]],
+                                                 squares[SQUARE_INDEX[move_uci[2:4]]], board_fen)
+
+    @staticmethod
+    def squares_move_to_lang(move_uci: str, piece_id: str, captured_id: str, board_fen: str) -> str:
+        """move_to_lang() from the piece symbols already read off the start and end squares."""
+        player_name, piece_des_name = PIECE_NAMES[piece_id]
+        # No piece on the start square, kept on the original path for its error reporting
+        if player_name == '.':
+            return StateAdapter.action_to_lang(StateAdapter.uci_to_lang_action(move_uci, board_fen), board_fen)
+        end_piece = PIECE_NAMES[captured_id][1]
+        captured_piece = end_piece.lower() if (end_piece != ".") else ""
+        return StateAdapter.move_description(player_name, piece_des_name, move_uci, captured_piece)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def move_description(player_nm: str, piece_nm: str, move_uci: str, captured_piece: str) -> str:
+        """Description table keyed by (player, piece, move, captured piece), each entry is built on first use.
+        The number of entries is bounded by the possible piece moves so the table is not size limited."""
+        LANG_action = StateAdapter.piece_lang_action(player_nm + ' ' + piece_nm, move_uci)
+        return StateAdapter.lang_action_description(LANG_action, captured_piece)
 
     @staticmethod
     def move_logics(player_nm: str, start_i: str, end_i: str, start_j: int, end_j: int, LANG_action) -> Tuple[str, int]:
@@ -293,6 +494,19 @@ class StateAdapter(Adapter):
         
     @staticmethod
     def action_to_lang(LANG_action: str, board_fen):
+        # Pawn doesn't get changed
+        if 'promoted' in LANG_action:
+            return LANG_action
+        end = LANG_action.split(" ")[5]
+        # Checks to see if final location matches an opponent's piece
+        end_piece = PIECE_NAMES[StateAdapter.board_squares(board_fen)[SQUARE_INDEX[end]]][1]
+        captured_piece = end_piece.lower() if (end_piece != ".") else ""
+        return StateAdapter.lang_action_description(LANG_action, captured_piece)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def lang_action_description(LANG_action: str, captured_piece: str) -> str:
+        """Description of a language action, e.g. 'White Pawn from e2 to e4' -> 'White pawn moves forward two spaces'."""
         LANG_action_split = LANG_action.split(" ")
         player_nm = LANG_action_split[0]
         piece_nm = LANG_action_split[1]
@@ -301,55 +515,82 @@ class StateAdapter(Adapter):
         start_j = int(start[1])
         # Pawn doesn't get changed
         if 'promoted' in LANG_action:
-            LANG_action_description = LANG_action
-        else:
-            end = LANG_action_split[5]
-            end_i = end[0]
-            end_j = int(end[1])
-            # Checks to see if final location matches an opponent's piece
-            board_PRIOR_Lang = StateAdapter.board_to_lang(board_fen)
-            end_piece = [piece for piece in board_PRIOR_Lang if (end in piece["board_pos"])][0]["piece_des_name"]
-            captured_piece = end_piece.lower() if (end_piece != ".") else ""
-
-            move_dir, move_dis = StateAdapter.move_logics(player_nm, start_i, end_i, start_j, end_j, LANG_action)
-        
-            piece_logic: Dict[Tuple[str], str] = {(r["Player"], r["Piece"], r["Move_dir"], r["Move_type"]): r["Language"] 
-                                                    for r in LOGIC_DF.to_records()}
-            if piece_nm == 'Pawn':
-                if (move_dir == 'forwards'):
-                    language = piece_logic[(player_nm, piece_nm, move_dir, "moves")]
-                elif move_dir.split(' ')[2] in ['right', 'left']:
-                    language = piece_logic[(player_nm, piece_nm, move_dir, "captures piece [N] by moving diagonally")]
-                else:
-                    print("ERROR")
-            else:
-                if captured_piece != '':
-                    language = piece_logic.get((player_nm, piece_nm, move_dir, "captures piece [N] by moving"), None)
-                    if (not language):
-                        language = piece_logic[(player_nm, piece_nm, move_dir, "captures piece [N] by moving diagonally")]
-                else:
-                    language = piece_logic.get((player_nm, piece_nm, move_dir, "moves"), None)
-                    if (not language):
-                        language = piece_logic[(player_nm, piece_nm, move_dir, "moves diagonally")]
-                                        
-            desc = language.replace('{ij}', start) # Replaces string with piece start pos
-            if 'captures' in desc:
-                LANG_action_description = desc.replace('[N]', captured_piece)
+            return LANG_action
+        end = LANG_action_split[5]
+        end_i = end[0]
+        end_j = int(end[1])
+
+        move_dir, move_dis = StateAdapter.move_logics(player_nm, start_i, end_i, start_j, end_j, LANG_action)
+        if piece_nm == 'Pawn':
+            if (move_dir == 'forwards'):
+                language = MOVE_LOGIC[(player_nm, piece_nm, move_dir, "moves")]
+            elif move_dir.split(' ')[2] in ['right', 'left']:
+                language = MOVE_LOGIC[(player_nm, piece_nm, move_dir, "captures piece [N] by moving diagonally")]
             else:
-                LANG_action_description = desc 
-            if piece_nm == 'knight':
-                desc_split = LANG_action_description.split('|')
-                desc_split_sub = desc_split[2].split('*')
-                LANG_action_description = desc_split[0] + str(move_dis) + desc_split_sub[0] + str(abs(end_i-start_i) )
+                print("ERROR")
+        else:
+            if captured_piece != '':
+                language = MOVE_LOGIC.get((player_nm, piece_nm, move_dir, "captures piece [N] by moving"), None)
+                if (not language):
+                    language = MOVE_LOGIC[(player_nm, piece_nm, move_dir, "captures piece [N] by moving diagonally")]
             else:
-                desc_split = LANG_action_description.split('|')
-                LANG_action_description = desc_split[0] + str(move_dis) + desc_split[2]
+                language = MOVE_LOGIC.get((player_nm, piece_nm, move_dir, "moves"), None)
+                if (not language):
+                    language = MOVE_LOGIC[(player_nm, piece_nm, move_dir, "moves diagonally")]
+                                    
+        desc = language.replace('{ij}', start) # Replaces string with piece start pos
+        if 'captures' in desc:
+            LANG_action_description = desc.replace('[N]', captured_piece)
+        else:
+            LANG_action_description = desc 
+        desc_split = LANG_action_description.split('|')
+        LANG_action_description = desc_split[0] + str(move_dis) + desc_split[2]
         return LANG_action_description
     
-    def adapter(self, board_fen:str, legal_actions:list = None, episode_action_history:list = None, encode:bool = True, indexed: bool = False) -> Tensor:
-        """All adapters must output Tensor, use pre-built Encoders in the Helios package to tranform states to this form."""
+    def language(self, board_fen:str, legal_moves:list = None, episode_action_history:list = None, position_key:int = None):
+        """State in its non-encoded (language) form, adapters define this for their state description."""
         pass
 
+    def encode(self, state) -> Tensor:
+        """Encode the language form of a state to a Tensor."""
+        return self.encoder.encode(state=state)
+
+    def index(self, state) -> Tensor:
+        """Map each sentence of the language form to its id in the shared sentence interner."""
+        sentences = [state] if isinstance(state, str) else state
+        return torch.tensor(get_interner().ids(sentences))
+
+    def key(self, state) -> int:
+        """Stable 64-bit integer key of the language form, for tabular agents."""
+        return state_key(state)
+
+    def language_from_context(self, context: PositionContext, episode_action_history:list = None):
+        """Language form from a position already parsed into a PositionContext.
+        Adapters that read the position override this, the default parses it again through language()."""
+        return self.language(context.board_fen, context.legal_moves, episode_action_history, context.position_key)
+
+    def adapt(self, board_fen:str, legal_moves:list = None, episode_action_history:list = None, position_key:int = None) -> AdaptedState:
+        """Adapt a position once, the returned object holds the language, encoded and indexed forms.
+        position_key (Engine.position_key) is optional, adapters use it in place of the FEN for position lookups."""
+        return AdaptedState(self, self.language(board_fen, legal_moves, episode_action_history, position_key))
+
+    def adapter(self, board_fen:str, legal_moves:list = None, episode_action_history:list = None, encode:bool = True, indexed: bool = False, position_key:int = None, keyed: bool = False) -> Tensor:
+        """All adapters must output Tensor, use pre-built Encoders in the Helios package to tranform states to this form.
+        keyed returns the state's 64-bit integer key instead (see key()), no Tensor is built."""
+        state = self.language(board_fen, legal_moves, episode_action_history, position_key)
+        if keyed:
+            return self.key(state)
+        if encode:
+            state_encoded = self.encode(state)
+        else:
+            state_encoded = state
+
+        if (indexed):
+            state_encoded = self.index(state)
+
+        return state_encoded
+
+    @staticmethod
     def sample():
         "Return a sample of the state adapted form (non-encoded)."
         pass
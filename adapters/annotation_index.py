@@ -0,0 +1,128 @@
+import os
+import json
+import argparse
+from typing import Dict, List
+import numpy as np
+import torch
+from torch import Tensor
+
+from adapters.adapter_abstract import fen_position_key
+
+# Prebuilt human annotation index used by HumanAnnotationsAdapter
+# - keys.npy: sorted uint64 position keys (polyglot Zobrist, see Engine.position_key)
+# - offsets.npy: int64, sentences of position i are rows offsets[i]:offsets[i+1]
+# - sentences.json: canonical sentence list of every position, in row order
+# - embeddings.npy: float32 sentence embeddings, one row per sentence
+# Built offline from commentary.json with: python -m adapters.annotation_index
+# Embeddings are opened read-only through a memory map and shared by every adapter in the process.
+INDEX_DIR = './language_info/annotation_index'
+ANNOTATION_PATH = './language_info/commentary.json'
+# Indexes are opened once per process, keyed by directory
+_INDEXES: Dict[str, 'AnnotationIndex'] = {}
+
+
+def canonical_sentences(annotation: List[str]) -> List[str]:
+    """Sentence list of a position's annotations: the longest annotation (first one if tied) split on '.',
+       with fragments under 3 characters removed."""
+    state = max(annotation, key=len)
+    return [s for s in state.split(".") if len(s) >= 3]
+
+
+class AnnotationIndex:
+    """Read-only position -> (sentences, embeddings) lookup over sorted keys and packed sentence rows."""
+    def __init__(self, keys: np.ndarray, offsets: np.ndarray, sentences: List[str], embeddings: np.ndarray = None):
+        self.keys = keys
+        self.offsets = offsets
+        self.sentences = sentences
+        self.embeddings = embeddings
+
+    @classmethod
+    def from_annotations(cls, annotations: Dict[str, List[str]], encoder = None) -> 'AnnotationIndex':
+        """Canonicalise a {board_fen: [annotation, ...]} dict, later FENs of the same position replace earlier ones.
+           Sentences are encoded in one batch if an encoder is given."""
+        position_sentences = {fen_position_key(board_fen): canonical_sentences(annotation) for board_fen, annotation in annotations.items()}
+        positions = sorted(position_sentences.items(), key=lambda p: p[0])
+        keys = np.array([key for key, sentences in positions], dtype=np.uint64)
+        offsets = np.zeros(len(positions)+1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(sentences) for key, sentences in positions])
+        sentences = [sent for key, position in positions for sent in position]
+        embeddings = None
+        if encoder is not None:
+            unique_sentences = list(dict.fromkeys(sentences))
+            encoded = torch.as_tensor(encoder.encode(state=unique_sentences)).detach().cpu().to(torch.float32).numpy()
+            rows = {sent: n for n, sent in enumerate(unique_sentences)}
+            embeddings = encoded[[rows[sent] for sent in sentences]] if len(sentences) > 0 else encoded
+        return cls(keys, offsets, sentences, embeddings)
+
+    @classmethod
+    def from_json(cls, annotation_path: str = ANNOTATION_PATH, encoder = None) -> 'AnnotationIndex':
+        with open(annotation_path) as annotated_games:
+            return cls.from_annotations(json.load(annotated_games), encoder)
+
+    @classmethod
+    def load(cls, index_dir: str = INDEX_DIR) -> 'AnnotationIndex':
+        with open(os.path.join(index_dir, 'sentences.json')) as sentences_file:
+            sentences = json.load(sentences_file)
+        return cls(np.load(os.path.join(index_dir, 'keys.npy'), mmap_mode='r'),
+                   np.load(os.path.join(index_dir, 'offsets.npy'), mmap_mode='r'),
+                   sentences,
+                   np.load(os.path.join(index_dir, 'embeddings.npy'), mmap_mode='r'))
+
+    def save(self, index_dir: str = INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, 'keys.npy'), np.ascontiguousarray(self.keys))
+        np.save(os.path.join(index_dir, 'offsets.npy'), np.ascontiguousarray(self.offsets))
+        np.save(os.path.join(index_dir, 'embeddings.npy'), np.ascontiguousarray(self.embeddings))
+        with open(os.path.join(index_dir, 'sentences.json'), 'w') as sentences_file:
+            json.dump(self.sentences, sentences_file)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def find(self, position_key: int) -> int:
+        """Row of a position in the index, -1 if it has no annotation."""
+        key = np.uint64(position_key)
+        i = int(np.searchsorted(self.keys, key))
+        if (i < len(self.keys)) and (self.keys[i] == key):
+            return i
+        return -1
+
+    def position_sentences(self, row: int) -> List[str]:
+        return self.sentences[self.offsets[row]:self.offsets[row+1]]
+
+    def position_embeddings(self, row: int) -> Tensor:
+        """Ready encoded state of a position, None if the index was built without embeddings."""
+        if self.embeddings is None:
+            return None
+        return torch.from_numpy(np.array(self.embeddings[self.offsets[row]:self.offsets[row+1]]))
+
+
+def load_index(index_dir: str = None, annotation_path: str = None) -> AnnotationIndex:
+    """Shared annotation index for this process, paths default to the module settings.
+       Uses the built index in index_dir if it exists, otherwise sentences are canonicalised in memory from
+       commentary.json and encoded at run time."""
+    index_dir = index_dir if index_dir is not None else INDEX_DIR
+    annotation_path = annotation_path if annotation_path is not None else ANNOTATION_PATH
+    if index_dir not in _INDEXES:
+        if os.path.exists(os.path.join(index_dir, 'embeddings.npy')):
+            _INDEXES[index_dir] = AnnotationIndex.load(index_dir)
+        else:
+            print("Annotation index not built in", index_dir, "- loading", annotation_path, "build it with: python -m adapters.annotation_index")
+            _INDEXES[index_dir] = AnnotationIndex.from_json(annotation_path)
+    return _INDEXES[index_dir]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Canonicalise and encode the human annotations used by HumanAnnotationsAdapter.")
+    parser.add_argument('--annotations', default=ANNOTATION_PATH)
+    parser.add_argument('--index_dir', default=INDEX_DIR)
+    args = parser.parse_args()
+
+    from adapters.encoder_registry import get_language_encoder
+    index = AnnotationIndex.from_json(args.annotations, get_language_encoder())
+    index.save(args.index_dir)
+    print("Annotation index saved to", args.index_dir, "|", len(index), "positions,", len(index.sentences), "sentences")
+
+
+if __name__ == "__main__":
+    main()
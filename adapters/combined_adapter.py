@@ -6,8 +6,8 @@ import chess
 from chess import Board
 
 # StateAdapter includes static methods for adapters
-from adapters.adapter_abstract import StateAdapter 
-from helios_rl.encoders.sentence_transformer_MiniLM_L6v2 import LanguageEncoder
+from adapters.adapter_abstract import StateAdapter, PositionContext
+from adapters.encoder_cache import CachedLanguageEncoder
 
 from adapters.board_to_language_adapter import BoardToLanguageAdapter
 from adapters.active_pieces_language_adapter import ActivePiecesLanguageAdapter
@@ -15,34 +15,29 @@ from adapters.prior_actions_to_language_adapter import PriorActionsToLanguageAda
 from adapters.poss_actions_to_language_adapter import PossibleActionsToLanguageAdapter
 
 class CombinedAdapter(StateAdapter):
+
     def __init__(self):
         self.BoardtoLanguage = BoardToLanguageAdapter()
         self.ActivePiecesLanguage = ActivePiecesLanguageAdapter()
         self.PriorActionstoLanguage = PriorActionsToLanguageAdapter()
         self.PossibleActionsToLanguage = PossibleActionsToLanguageAdapter()
-        self.encoder = LanguageEncoder()
+        self.encoder = CachedLanguageEncoder()
     
-    def adapter(self, board_fen:str, legal_moves:list = None, episode_action_history:list = None, encode:bool = True, indexed: bool = False) -> Tensor:
-        """ Combines all other adapters into a single state description """
-        board: Board = chess.Board(board_fen)
-        board_lang = self.BoardtoLanguage.adapter(board, legal_moves, episode_action_history, encode=False, indexed=indexed)
-        active_pieces_lang = self.ActivePiecesLanguage.adapter(board, legal_moves, episode_action_history, encode=False, indexed=indexed)
-        prior_action_lang = self.PriorActionstoLanguage.adapter(board, legal_moves, episode_action_history, encode=False, indexed=indexed)
-        poss_action_lang = self.PossibleActionsToLanguage.adapter(board, legal_moves, episode_action_history, encode=False, indexed=indexed)
+    def language(self, board_fen:str, legal_moves:list = None, episode_action_history:list = None, position_key:int = None) -> List[str]:
+        """ Combines all other adapters into a single state description.
+        The position is parsed once into a PositionContext that every sub-adapter reads from. """
+        context = PositionContext(board_fen, legal_moves, position_key)
+        board_lang = self.BoardtoLanguage.language_from_context(context, episode_action_history)
+        active_pieces_lang = self.ActivePiecesLanguage.language_from_context(context, episode_action_history)
+        prior_action_lang = self.PriorActionstoLanguage.language_from_context(context, episode_action_history)
+        poss_action_lang = self.PossibleActionsToLanguage.language_from_context(context, episode_action_history)
 
+        active_pieces_lang = [active_pieces_lang] if isinstance(active_pieces_lang, str) else active_pieces_lang
         state = board_lang + active_pieces_lang + prior_action_lang + poss_action_lang
         state.remove('')
-
-        if (not indexed):
-            if encode:
-                state_encoded = self.encoder.encode(state=state)
-            else:
-                state_encoded = state
-        else:
-            state_encoded = torch.tensor(state)
-
-        return state_encoded
+        return state
     
+    @staticmethod
     def sample():
         board = chess.Board(fen='rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2')
         legal_moves = ['g1h3', 'g1f3', 'g1e2', 'f1a6', 'f1b5', 'f1c4', 'f1d3', 
@@ -51,11 +46,11 @@ class CombinedAdapter(StateAdapter):
                        'b2b3', 'a2a3', 'h2h4', 'g2g4', 'f2f4', 'd2d4', 'c2c4', 'b2b4', 'a2a4']
         episode_action_history = ['e2e4', 'c7c5']
         adapter = CombinedAdapter()
-        state = adapter.adapter(board, legal_moves, [], encode=False)
-        state = adapter.adapter(board, legal_moves, [episode_action_history[0]], encode=False)
-        state = adapter.adapter(board, legal_moves, episode_action_history, encode=False)
+        state = adapter.adapter(board.fen(), legal_moves, [], encode=False)
+        state = adapter.adapter(board.fen(), legal_moves, [episode_action_history[0]], encode=False)
+        state = adapter.adapter(board.fen(), legal_moves, episode_action_history, encode=False)
         adapter = CombinedAdapter()
-        state_encoded = adapter.adapter(board, legal_moves, [], encode=True)
-        state_encoded = adapter.adapter(board, legal_moves, [episode_action_history[0]], encode=True)
-        state_encoded = adapter.adapter(board, legal_moves, episode_action_history, encode=True)
+        state_encoded = adapter.adapter(board.fen(), legal_moves, [], encode=True)
+        state_encoded = adapter.adapter(board.fen(), legal_moves, [episode_action_history[0]], encode=True)
+        state_encoded = adapter.adapter(board.fen(), legal_moves, episode_action_history, encode=True)
         return state, state_encoded
\ No newline at end of file
@@ -4,10 +4,9 @@ import torch
 from torch import Tensor
 # StateAdapter includes static methods for adapters
 from helios_rl.encoders.poss_state_encoded import StateEncoder
+from adapters.sentence_interner import get_interner
 
 class DefaultAdapter:
-    _cached_state_idx: Dict[str, int] = dict()
-
     def __init__(self):
         # TODO: Update this based on the current problem, each requires preset knowledge of all possible states/actions/objects
         # - Possible Atates
@@ -29,12 +28,7 @@ class DefaultAdapter:
             state_encoded = state
 
         if (indexed):
-            state_indexed = list()
-            for sent in state:
-                if (sent not in DefaultAdapter._cached_state_idx):
-                    DefaultAdapter._cached_state_idx[sent] = len(DefaultAdapter._cached_state_idx)
-                state_indexed.append(DefaultAdapter._cached_state_idx[sent])
-
-            state_encoded = torch.tensor(state_indexed)
+            # Ids from the shared sentence interner, consistent across adapters and processes
+            state_encoded = torch.tensor(get_interner().ids([str(sent) for sent in state]))
 
         return state_encoded
\ No newline at end of file
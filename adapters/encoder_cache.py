@@ -0,0 +1,226 @@
+import os
+import json
+import weakref
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+import torch
+from torch import Tensor
+
+from adapters.encoder_registry import LanguageEncoder, SharedLanguageEncoder
+from adapters.sentence_interner import sentence_key, FileLock
+
+# Cache settings, set from config_local.json before adapters are built (see configure())
+# - max_size: max number of sentence embeddings held in memory per process (LRU eviction, shared by all encoders on the process-wide model)
+# - store_path: optional directory of a memory-mapped embedding store shared across runs/processes
+CACHE_SETTINGS: Dict[str, any] = {'max_size': 50000, 'store_path': None, 'store_capacity': 2**18}
+# Memory-mapped stores are opened once per process and shared by all encoders
+_STORES: Dict[str, 'EmbeddingStore'] = {}
+# LRU shared by every encoder on the process-wide model, created on first use so max_size is bounded once per process
+_SHARED_CACHE: 'SentenceCache' = None
+# Live caches in the process (the shared one and any private ones), used to report combined hit rates
+_CACHES: 'weakref.WeakSet[SentenceCache]' = weakref.WeakSet()
+
+
+def configure(max_size: int = None, store_path: str = None, store_capacity: int = None):
+    """Update cache settings for encoders created after this call."""
+    if max_size is not None:
+        CACHE_SETTINGS['max_size'] = max_size
+        if _SHARED_CACHE is not None:
+            _SHARED_CACHE.resize(max_size)
+    if store_path is not None:
+        CACHE_SETTINGS['store_path'] = store_path
+    if store_capacity is not None:
+        CACHE_SETTINGS['store_capacity'] = store_capacity
+
+
+class EmbeddingStore:
+    """Fixed-capacity open-addressing table of sentence embeddings in memory-mapped files.
+       Keys are 64-bit content hashes (0 = empty slot). A full probe window overwrites its first slot
+       so disk use is bounded. Files are opened shared so other processes see new entries.
+       Files are created and entries written under a file lock, lookups are lock free."""
+    MAX_PROBE: int = 16
+
+    def __init__(self, path: str, capacity: int = 2**18):
+        self.path = path
+        self.capacity = capacity
+        self.dim: int = None
+        self.keys: np.memmap = None
+        self.vectors: np.memmap = None
+        os.makedirs(path, exist_ok=True)
+        with self._lock():
+            self._open_existing()
+
+    def _lock(self):
+        """Exclusive lock on the store files, held while they are created or written."""
+        return FileLock(os.path.join(self.path, 'lock'))
+
+    def _open_existing(self):
+        """Open the store if it has been created, meta.json is written last so its files are complete."""
+        meta_path = os.path.join(self.path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            self._open(meta['capacity'], meta['dim'], mode='r+')
+
+    def _open(self, capacity: int, dim: int, mode: str):
+        self.capacity = capacity
+        self.dim = dim
+        self.keys = np.memmap(os.path.join(self.path, 'keys.u64'), dtype=np.uint64, mode=mode, shape=(capacity,))
+        self.vectors = np.memmap(os.path.join(self.path, 'vectors.f32'), dtype=np.float32, mode=mode, shape=(capacity, dim))
+
+    def _create(self, dim: int):
+        """Create the store files, only called under the lock once no meta.json exists so no process has them mapped."""
+        self._open(self.capacity, dim, mode='w+')
+        self.keys.flush()
+        with open(os.path.join(self.path, 'meta.json'), 'w') as meta_file:
+            json.dump({'capacity': self.capacity, 'dim': dim}, meta_file)
+
+    def get(self, key: int):
+        if self.keys is None:
+            return None
+        key = np.uint64(key)
+        for probe in range(self.MAX_PROBE):
+            slot = (int(key) + probe) % self.capacity
+            slot_key = self.keys[slot]
+            if slot_key == 0:
+                return None
+            if slot_key == key:
+                vector = np.array(self.vectors[slot])
+                # Another process may have overwritten the slot while it was read
+                return vector if self.keys[slot] == key else None
+        return None
+
+    def put(self, key: int, vector: np.ndarray):
+        with self._lock():
+            if self.keys is None:
+                # Another process may have created the store since this one was opened
+                self._open_existing()
+                if self.keys is None:
+                    self._create(vector.shape[-1])
+            key = np.uint64(key)
+            target = int(key) % self.capacity
+            for probe in range(self.MAX_PROBE):
+                slot = (int(key) + probe) % self.capacity
+                if (self.keys[slot] == 0) | (self.keys[slot] == key):
+                    target = slot
+                    break
+            # Vector is written before its key so readers never match a key without its vector
+            self.keys[target] = 0
+            self.vectors[target] = vector
+            self.keys[target] = key
+
+
+class SentenceCache:
+    """Bounded LRU of sentence embeddings with hit/miss counts."""
+    def __init__(self, max_size: int):
+        self.max_size: int = max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.store_hits: int = 0
+        self.misses: int = 0
+        _CACHES.add(self)
+
+    def get(self, sentence: str):
+        embedding = self.entries.get(sentence, None)
+        if embedding is not None:
+            self.entries.move_to_end(sentence)
+        return embedding
+
+    def add(self, sentence: str, embedding: Tensor):
+        self.entries[sentence] = embedding
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def resize(self, max_size: int):
+        self.max_size = max_size
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def shared_cache() -> SentenceCache:
+    """The process-wide LRU used by encoders on the shared model."""
+    global _SHARED_CACHE
+    if _SHARED_CACHE is None:
+        _SHARED_CACHE = SentenceCache(CACHE_SETTINGS['max_size'])
+    return _SHARED_CACHE
+
+
+class CachedLanguageEncoder:
+    """LanguageEncoder with a bounded LRU sentence-to-embedding cache and optional shared on-disk store.
+       Only sentences not already cached are sent to the model, in a single batch.
+       By default the process-wide encoder (adapters.encoder_registry) is used, loaded on the first miss,
+       and the LRU is shared by all such encoders in the process so memory is bounded by one max_size.
+       An encoder given its own model or max_size keeps a private LRU."""
+    def __init__(self, encoder: LanguageEncoder = None, max_size: int = None, store_path: str = None):
+        self.encoder = encoder if encoder is not None else SharedLanguageEncoder()
+        if (encoder is None) and (max_size is None):
+            self.cache: SentenceCache = shared_cache()
+        else:
+            self.cache: SentenceCache = SentenceCache(max_size if max_size is not None else CACHE_SETTINGS['max_size'])
+        store_path = store_path if store_path is not None else CACHE_SETTINGS['store_path']
+        if store_path is not None:
+            if store_path not in _STORES:
+                _STORES[store_path] = EmbeddingStore(store_path, CACHE_SETTINGS['store_capacity'])
+            self.store = _STORES[store_path]
+        else:
+            self.store = None
+
+    def _lookup(self, sentence: str):
+        embedding = self.cache.get(sentence)
+        if embedding is not None:
+            self.cache.hits += 1
+            return embedding
+        if self.store is not None:
+            vector = self.store.get(sentence_key(sentence))
+            if vector is not None:
+                embedding = torch.from_numpy(vector)
+                self.cache.add(sentence, embedding)
+                self.cache.store_hits += 1
+                return embedding
+        return None
+
+    def encode(self, state) -> Tensor:
+        single = isinstance(state, str)
+        sentences = [state] if single else list(state)
+        if len(sentences) == 0:
+            return self.encoder.encode(state=state)
+
+        embeddings = [self._lookup(sentence) for sentence in sentences]
+        missing = list(dict.fromkeys([sentence for sentence, embedding in zip(sentences, embeddings) if embedding is None]))
+        if len(missing) > 0:
+            self.cache.misses += sum([embedding is None for embedding in embeddings])
+            encoded = torch.as_tensor(self.encoder.encode(state=missing))
+            new_embeddings = {}
+            for sentence, embedding in zip(missing, encoded):
+                embedding = embedding.detach().cpu().to(torch.float32)
+                new_embeddings[sentence] = embedding
+                self.cache.add(sentence, embedding)
+                if self.store is not None:
+                    self.store.put(sentence_key(sentence), embedding.numpy())
+            embeddings = [embedding if embedding is not None else new_embeddings[sentence]
+                          for sentence, embedding in zip(sentences, embeddings)]
+
+        state_encoded = torch.stack(embeddings)
+        return state_encoded[0] if single else state_encoded
+
+    def stats(self) -> Dict[str, float]:
+        """Hit rate of this encoder's LRU, the process-wide one unless it has a private cache."""
+        cache = self.cache
+        lookups = cache.hits + cache.store_hits + cache.misses
+        return {'hits': cache.hits, 'store_hits': cache.store_hits, 'misses': cache.misses, 'size': len(cache),
+                'hit_rate': (cache.hits + cache.store_hits)/lookups if lookups > 0 else 0.0}
+
+
+def cache_stats() -> Dict[str, float]:
+    """Combined hit rate over the live caches in this process."""
+    caches = list(_CACHES)
+    hits = sum([cache.hits for cache in caches])
+    store_hits = sum([cache.store_hits for cache in caches])
+    misses = sum([cache.misses for cache in caches])
+    lookups = hits + store_hits + misses
+    return {'hits': hits, 'store_hits': store_hits, 'misses': misses,
+            'hit_rate': (hits + store_hits)/lookups if lookups > 0 else 0.0}
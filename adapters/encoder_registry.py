@@ -0,0 +1,48 @@
+import time
+import resource
+from typing import Dict
+from torch import Tensor
+
+from helios_rl.encoders.sentence_transformer_MiniLM_L6v2 import LanguageEncoder
+
+# Process-wide sentence encoder shared by every language adapter
+# - the MiniLM model is only loaded the first time a sentence is encoded, so adapters used for
+#   language or indexed output never load it
+# - load time and the process memory it added are kept in ENCODER_STATS and printed once on load
+_ENCODER: LanguageEncoder = None
+ENCODER_STATS: Dict[str, float] = {'loaded': False, 'load_time_s': 0.0, 'rss_increase_mb': 0.0}
+
+
+def _rss_mb() -> float:
+    """Current resident set size of this process, peak RSS where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1])*resource.getpagesize()/(1024**2)
+    except OSError:
+        # ru_maxrss is in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+
+def get_language_encoder() -> LanguageEncoder:
+    """The process's LanguageEncoder, created on the first call."""
+    global _ENCODER
+    if _ENCODER is None:
+        start_rss = _rss_mb()
+        start = time.perf_counter()
+        _ENCODER = LanguageEncoder()
+        ENCODER_STATS['loaded'] = True
+        ENCODER_STATS['load_time_s'] = time.perf_counter() - start
+        ENCODER_STATS['rss_increase_mb'] = _rss_mb() - start_rss
+        print("Language encoder loaded in " + str(round(ENCODER_STATS['load_time_s'], 2)) + "s, +"
+              + str(round(ENCODER_STATS['rss_increase_mb'], 1)) + "MB RSS")
+    return _ENCODER
+
+
+class SharedLanguageEncoder:
+    """Handle to the shared LanguageEncoder, safe to create in adapter __init__ as nothing is loaded until encode()."""
+    def encode(self, state) -> Tensor:
+        return get_language_encoder().encode(state=state)
+
+
+def encoder_stats() -> Dict[str, float]:
+    return dict(ENCODER_STATS)
@@ -3,71 +3,49 @@ from functools import lru_cache
 import pandas as pd
 import torch
 from torch import Tensor
-import json
 import chess
 from chess import Board
 
-from adapters.adapter_abstract import StateAdapter
-from helios_rl.encoders.sentence_transformer_MiniLM_L6v2 import LanguageEncoder
+from adapters.adapter_abstract import StateAdapter, AdaptedState, fen_position_key
+from adapters.annotation_index import AnnotationIndex, load_index
+from adapters.encoder_cache import CachedLanguageEncoder
 from adapters.board_adapter import BoardAdapter
 
 class HumanAnnotationsAdapter(StateAdapter):
-    _cached_state_idx: Dict[str, int] = dict()
 
     def __init__(self):
-        # Import annotation info
-        with open("./language_info/commentary.json") as annotated_games:
-            self.annotations = {" ".join(fen.split()[:3]): annot for fen, annot in json.load(annotated_games).items()}    
+        # Annotation info, canonical sentences (and their embeddings if built) keyed by position
+        # - shared by all adapters in the process, see adapters/annotation_index.py
+        self.annotations: AnnotationIndex = load_index()
 
-        self.encoder = LanguageEncoder()
+        self.encoder = CachedLanguageEncoder()
         self.board_to_adapter = BoardAdapter()
         self.prior_state = 'None'
         
-    def adapter(self, board_fen:str, legal_moves:list = None, episode_action_history:list = None, encode:bool = True, indexed: bool = False) -> Tensor:
+    def language(self, board_fen:str, legal_moves:list = None, episode_action_history:list = None, position_key:int = None) -> List[str]:
         """ Use NL name for every piece name for current board position """
 
-        board = " ".join(board_fen.split()[:3])
-        if board in self.annotations:
-            annotation = self.annotations[board]
-            # If multiple entries, select longest.
-            if len(annotation) > 1:
-                max_len = len(annotation[0])
-                state = annotation[0]
-                for label in annotation[1:]:
-                    if len(label)>max_len:
-                        state = label   
-            else:
-                state = annotation[0]
-            state = state.split(".")
-            state = [s for s in state if len(s) >=3]
-            
-            # state = [f"{piece['piece_des_name']} at {piece['board_pos']}" 
-            #   for piece in board_CURRENT_Lang if (piece["piece_des_name"] != ".")]
-            # Encode to Tensor for agents
-            if encode:
-                state_encoded = self.encoder.encode(state)
-            else:
-                state_encoded = state
+        board = position_key if position_key is not None else fen_position_key(board_fen)
+        return self.annotated_language(self.annotations.find(board))
+
+    def annotated_language(self, row: int) -> List[str]:
+        if row >= 0:
+            # Longest annotation split into sentences, canonicalised when the index is built
+            state = self.annotations.position_sentences(row)
         else:
             # backup if board not in lookup
             state = [self.prior_state + " progressing"]
             self.prior_state = state[-1]
-            if encode:
-                state_encoded = self.encoder.encode(state)
-            else:
-                state_encoded = state
-
-        if (indexed):
-            state_indexed = list()
-            for sent in state:
-                if (sent not in HumanAnnotationsAdapter._cached_state_idx):
-                    HumanAnnotationsAdapter._cached_state_idx[sent] = len(HumanAnnotationsAdapter._cached_state_idx)
-                state_indexed.append(HumanAnnotationsAdapter._cached_state_idx[sent])
+        return state
 
-            state_encoded = torch.tensor(state_indexed)
-        
-        return state_encoded
+    def adapt(self, board_fen:str, legal_moves:list = None, episode_action_history:list = None, position_key:int = None) -> AdaptedState:
+        """Annotated positions return the prebuilt sentence embeddings so are not encoded at run time.
+        The embeddings are only read from the index when the encoded form is used."""
+        row = self.annotations.find(position_key if position_key is not None else fen_position_key(board_fen))
+        encoded = (lambda: self.annotations.position_embeddings(row)) if (row >= 0) and (self.annotations.embeddings is not None) else None
+        return AdaptedState(self, self.annotated_language(row), encoded)
     
+    @staticmethod
     def sample():
         board = chess.Board(fen='rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2')
         legal_moves = ['g1h3', 'g1f3', 'g1e2', 'f1a6', 'f1b5', 'f1c4', 'f1d3', 
@@ -76,6 +54,6 @@ class HumanAnnotationsAdapter(StateAdapter):
                        'b2b3', 'a2a3', 'h2h4', 'g2g4', 'f2f4', 'd2d4', 'c2c4', 'b2b4', 'a2a4']
         episode_action_history = ['e2e4', 'c7c5']
         adapter = HumanAnnotationsAdapter()
-        state = adapter.adapter(board, legal_moves, episode_action_history, encode=False)
-        state_encoded = adapter.adapter(board, legal_moves, episode_action_history, encode=True)
+        state = adapter.adapter(board.fen(), legal_moves, episode_action_history, encode=False)
+        state_encoded = adapter.adapter(board.fen(), legal_moves, episode_action_history, encode=True)
         return state, state_encoded
\ No newline at end of file
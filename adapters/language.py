@@ -3,14 +3,13 @@ import pandas as pd
 import torch
 from torch import Tensor
 # StateAdapter includes static methods for adapters
-from helios_rl.encoders.sentence_transformer_MiniLM_L6v2 import LanguageEncoder
+from adapters.encoder_registry import SharedLanguageEncoder
+from adapters.sentence_interner import get_interner
 
 class LanguageAdapter:
-    _cached_state_idx: Dict[str, int] = dict()
-
     def __init__(self):
         # Language encoder doesn't require any preset knowledge of env to use
-        self.encoder = LanguageEncoder()
+        self.encoder = SharedLanguageEncoder()
     
     def adapter(self, state:any, legal_moves:list = None, episode_action_history:list = None, encode:bool = True, indexed: bool = False) -> Tensor:
         """ Use Language name for every piece name for current board position """
@@ -22,12 +21,7 @@ class LanguageAdapter:
             state_encoded = state
 
         if (indexed):
-            state_indexed = list()
-            for sent in state:
-                if (sent not in DefaultAdapter._cached_state_idx):
-                    DefaultAdapter._cached_state_idx[sent] = len(DefaultAdapter._cached_state_idx)
-                state_indexed.append(DefaultAdapter._cached_state_idx[sent])
-
-            state_encoded = torch.tensor(state_indexed)
+            # Ids from the shared sentence interner, consistent across adapters and processes
+            state_encoded = torch.tensor(get_interner().ids(state))
 
         return state_encoded
\ No newline at end of file
@@ -6,58 +6,70 @@ import chess
 from chess import Board
 
 # StateAdapter includes static methods for adapters
-from adapters.adapter_abstract import StateAdapter
-from helios_rl.encoders.sentence_transformer_MiniLM_L6v2 import LanguageEncoder
+from adapters.adapter_abstract import StateAdapter, PositionContext
+from adapters.encoder_cache import CachedLanguageEncoder
 
 class PossibleActionsToLanguageAdapter(StateAdapter): 
-    _cached_state_idx: Dict[str, int] = dict()
+    # Embedding table shared by all instances, each move description is encoded once and then gathered by row
+    _sentence_rows: Dict[str, int] = dict()
+    _embedding_table: Tensor = None
 
     def __init__(self, size: int = 125):
         self.size = size # Max num of moves for a single board is suggested to be around 110
         self.temp_board: Board = chess.Board()
         self.language_action_history: List[str] = []
         self.last_known_action: str = ''
-        self.encoder = LanguageEncoder()
+        self.encoder = CachedLanguageEncoder()
 
-    def adapter(self, board_fen: str, legal_moves:list = None, episode_action_history:list = None, encode:bool = True, indexed: bool = False) -> Tensor:
+    def language(self, board_fen: str, legal_moves:list = None, episode_action_history:list = None, position_key:int = None) -> List[str]:
         """Vector of possible actions."""
-        possible_actions_to_Lang: List[str] = list()
+        return self.language_from_context(PositionContext(board_fen, legal_moves, position_key), episode_action_history)
 
+    def language_from_context(self, context: PositionContext, episode_action_history:list = None) -> List[str]:
         if len(episode_action_history)==0:
             self.temp_board.reset()
             self.language_action_history: List[str] = []
             self.last_known_action:str = ''
-            if encode:
-                state_encoded = self.encoder.encode(['']*self.size)
-            else:
-                state_encoded = ['']
+            state = ['']
         else:
-            for action in legal_moves:
-                # 1 -> 'e2e4' to 'White pawn from e2 to e4'
-                # 2 --> 'White pawn from e2 to e4' to 'White pawn moves forward two spaces'
-                LANG_action = StateAdapter.uci_to_lang_action(action, board_fen)
-                LANG_action_description = StateAdapter.action_to_lang(LANG_action=LANG_action, board_fen=board_fen)
-                possible_actions_to_Lang.append(LANG_action_description)
+            # 1 -> 'e2e4' to 'White pawn from e2 to e4'
+            # 2 --> 'White pawn from e2 to e4' to 'White pawn moves forward two spaces'
+            possible_actions_to_Lang: List[str] = context.move_descriptions
             
-            # Encode to Tensor for agents
             # -> fixed length with empty string when few possible actions
             state = ['']*(self.size-len(possible_actions_to_Lang)) + possible_actions_to_Lang[:self.size]
-            # Encode each action seperately and stack
-            if encode:
-                state_encoded = self.encoder.encode(state=state)
-            else:
-                state_encoded = state
+        return state
 
-            if (indexed):
-                state_indexed = list()
-                for sent in state:
-                    if (sent not in PossibleActionsToLanguageAdapter._cached_state_idx):
-                        PossibleActionsToLanguageAdapter._cached_state_idx[sent] = len(PossibleActionsToLanguageAdapter._cached_state_idx)
-                    state_indexed.append(PossibleActionsToLanguageAdapter._cached_state_idx[sent])
+    @classmethod
+    def _add_rows(cls, sentences: List[str], embeddings: Tensor):
+        """Append new sentence embeddings to the shared table, growing it by doubling."""
+        num_rows = len(cls._sentence_rows)
+        if (cls._embedding_table is None) or (num_rows+len(sentences) > cls._embedding_table.shape[0]):
+            table = torch.empty((max(1024, 2*(num_rows+len(sentences))), embeddings.shape[-1]), dtype=embeddings.dtype)
+            if cls._embedding_table is not None:
+                table[:num_rows] = cls._embedding_table[:num_rows]
+            cls._embedding_table = table
+        cls._embedding_table[num_rows:num_rows+len(sentences)] = embeddings
+        for n, sent in enumerate(sentences):
+            cls._sentence_rows[sent] = num_rows+n
 
-                state_encoded = torch.tensor(state_indexed)
+    def encode_batch(self, states: List[List[str]]) -> List[Tensor]:
+        """Encode the states of several boards, sentences not seen before are sent to the encoder in one batch."""
+        cls = type(self)
+        # Start of episode has no possible actions described, encoded as a fully padded state
+        states = [(['']*self.size if state == [''] else state) for state in states]
+        # Padding ('') is always the first row
+        new_sentences = [sent for sent in dict.fromkeys([''] + [sent for state in states for sent in state]) 
+                         if sent not in cls._sentence_rows]
+        if len(new_sentences) > 0:
+            cls._add_rows(new_sentences, torch.as_tensor(self.encoder.encode(state=new_sentences)))
+        # Gather each state from the table, the result is a new tensor as states are kept by agents
+        return [torch.index_select(cls._embedding_table, 0, torch.tensor([cls._sentence_rows[sent] for sent in state]))
+                for state in states]
 
-        return state_encoded
+    def encode(self, state: List[str]) -> Tensor:
+        # Encode each action seperately and stack
+        return self.encode_batch([state])[0]
     
     @staticmethod
     def sample():
@@ -68,6 +80,6 @@ class PossibleActionsToLanguageAdapter(StateAdapter):
                        'b2b3', 'a2a3', 'h2h4', 'g2g4', 'f2f4', 'd2d4', 'c2c4', 'b2b4', 'a2a4']
         episode_action_history = ['e2e4', 'c7c5']
         adapter = PossibleActionsToLanguageAdapter()
-        state = adapter.adapter(board, legal_moves, episode_action_history, encode=False)
-        state_encoded = adapter.adapter(board, legal_moves, episode_action_history, encode=True)
+        state = adapter.adapter(board.fen(), legal_moves, episode_action_history, encode=False)
+        state_encoded = adapter.adapter(board.fen(), legal_moves, episode_action_history, encode=True)
         return state, state_encoded
\ No newline at end of file
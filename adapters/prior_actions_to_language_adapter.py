@@ -1,4 +1,5 @@
 from typing import List, Dict
+from collections import deque
 import pandas as pd
 import torch
 from torch import Tensor
@@ -8,77 +9,94 @@ from chess import Board
 
 # StateAdapter includes static methods for adapters
 from adapters.adapter_abstract import StateAdapter
-from helios_rl.encoders.sentence_transformer_MiniLM_L6v2 import LanguageEncoder
+from adapters.encoder_cache import CachedLanguageEncoder
 
 class PriorActionsToLanguageAdapter(StateAdapter):
-    _cached_state_idx: Dict[str, int] = dict()
+    # Encoded from the per-game ring buffer, VectorEnvironment encodes each board with its own adapter
+    incremental_encode: bool = True
 
     def __init__(self, size: int = 15):
         self.size = size
         self.temp_board:Board = chess.Board()
         
-        self.encoder = LanguageEncoder()
+        self.encoder = CachedLanguageEncoder()
+        # Ring buffer of the last 'size' action descriptions and their embeddings
+        # - each ply adds one description, encode() only sends descriptions not yet embedded to the encoder
+        # - embedding rows are written at ring_head and read back oldest first, unused rows hold the padding ('') embedding
+        self.language_action_history: deque = deque(maxlen=size)
+        self.num_actions: int = 0
+        self.num_embedded: int = 0
+        self.ring_embeddings: Tensor = None
+        self.ring_head: int = 0
+        # Last window returned by language(), encode() uses the ring buffer only for this window
+        self.window: List[str] = None
 
-    def adapter(self, board_fen:str = None, legal_moves:list = None, episode_action_history:list = None, encode:bool = True, indexed: bool = False) -> Tensor:
+    def language(self, board_fen:str = None, legal_moves:list = None, episode_action_history:list = None, position_key:int = None) -> List[str]:
         """Map prior actions to Language versions using Logic Rules. 
         Needs to add both the last white and black player's moves into the list."""
         # We play through the episode actions to extract the pieces that were moved
         # -> Reset board on new episode and set encoded state for empty action history        
         if len(episode_action_history)==0:
             self.temp_board.reset()
-            self.language_action_history: List[str] = []
-            self.last_known_action:str = ''
-            if encode:
-                state_encoded = self.encoder.encode(['']*self.size)
-            else:
-                state_encoded = ['']
+            self.language_action_history.clear()
+            self.num_actions = 0
+            self.num_embedded = 0
+            self.ring_head = 0
+            if self.ring_embeddings is not None:
+                self.ring_embeddings[:] = self.encoder.encode('')
+            action_history = ['']
         else:
-            # We currently call the adapter in the env back to back for each player perspective
+            # The legacy adapter() interface may be called back to back for the same position
             # -> for other adapters this is fine but we can't log the same info twice here
-            if self.last_known_action == episode_action_history[-1]:
-                self.language_action_history = self.language_action_history
-            else:
+            if self.num_actions != len(episode_action_history):
                 last_action = episode_action_history[-1]
-                board_fen_temp = self.temp_board.fen()
-                # Transform action to language description
+                # Transform action to language description from the pieces on the start and end squares
                 # 1 -> 'e2e4' to 'White pawn from e2 to e4'
                 # 2 --> 'White pawn from e2 to e4' to 'White pawn moves forward two spaces'
-                LANG_action = StateAdapter.uci_to_lang_action(last_action, board_fen_temp)
-                LANG_action_description = StateAdapter.action_to_lang(LANG_action, board_fen_temp)
+                move = chess.Move.from_uci(last_action)
+                piece = self.temp_board.piece_at(move.from_square)
+                if piece is None:
+                    LANG_action_description = StateAdapter.move_to_lang(last_action, self.temp_board.fen())
+                else:
+                    captured = self.temp_board.piece_at(move.to_square)
+                    LANG_action_description = StateAdapter.squares_move_to_lang(last_action, piece.symbol(), 
+                                                                                captured.symbol() if captured else '.', None)
                 # Store language descriptions of each action
                 self.language_action_history.append(LANG_action_description)
-                
+                self.num_actions = len(episode_action_history)
                 # Update temp board to continue game for next action
-                try:
-                    self.temp_board.push_san(self.temp_board.san(chess.Move.from_uci(last_action)))
-                except:
-                    print(" ")
-                    print(self.temp_board)
-                    print(episode_action_history)
-                    print(last_action)
-                    self.temp_board.push_san(self.temp_board.san(chess.Move.from_uci(last_action)))
-                self.last_known_action = last_action
+                self.temp_board.push(move)
             
-            # Encode to Tensor for agents
             # -> fixed length with empty string when few prior actions
-            action_history = ['']*(self.size-len(self.language_action_history)) + self.language_action_history[-self.size:]
-            # We need to feed actions individually to encoder to preserve order
-            if encode:
-                state_encoded = self.encoder.encode(state=action_history)
-            else:
-                state_encoded = action_history
+            action_history = ['']*(self.size-len(self.language_action_history)) + list(self.language_action_history)
+        self.window = action_history
+        return action_history
 
-            if (indexed):
-                state_indexed = list()
-                for sent in action_history:
-                    if (sent not in PriorActionsToLanguageAdapter._cached_state_idx):
-                        PriorActionsToLanguageAdapter._cached_state_idx[sent] = len(PriorActionsToLanguageAdapter._cached_state_idx)
-                    state_indexed.append(PriorActionsToLanguageAdapter._cached_state_idx[sent])
+    def _update_ring(self):
+        """Embed the descriptions added since the last update, one per ply in an episode loop."""
+        if self.ring_embeddings is None:
+            padding = self.encoder.encode('')
+            self.ring_embeddings = padding.unsqueeze(0).repeat(self.size, 1)
+        num_new = min(self.num_actions - self.num_embedded, self.size)
+        if num_new > 0:
+            new_embeddings = self.encoder.encode(list(self.language_action_history)[-num_new:])
+            for embedding in new_embeddings:
+                self.ring_embeddings[self.ring_head] = embedding
+                self.ring_head = (self.ring_head + 1) % self.size
+        self.num_embedded = self.num_actions
 
-                state_encoded = torch.tensor(state_indexed)
-
-        return state_encoded
+    def encode(self, state: List[str]) -> Tensor:
+        # Current window: read from the ring buffer oldest first, a new tensor as states are kept by agents
+        if state is self.window:
+            self._update_ring()
+            return torch.cat((self.ring_embeddings[self.ring_head:], self.ring_embeddings[:self.ring_head]))
+        # Start of episode has no prior actions, encoded as a fully padded state
+        if state == ['']:
+            return self.encoder.encode(['']*self.size)
+        # We need to feed actions individually to encoder to preserve order
+        return self.encoder.encode(state=state)
     
+    @staticmethod
     def sample():
         board = chess.Board(fen='rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2')
         legal_moves = ['g1h3', 'g1f3', 'g1e2', 'f1a6', 'f1b5', 'f1c4', 'f1d3', 
@@ -87,12 +105,12 @@ class PriorActionsToLanguageAdapter(StateAdapter):
                        'b2b3', 'a2a3', 'h2h4', 'g2g4', 'f2f4', 'd2d4', 'c2c4', 'b2b4', 'a2a4']
         episode_action_history = ['e2e4', 'c7c5']
         adapter = PriorActionsToLanguageAdapter()
-        state = adapter.adapter(board, legal_moves, [], encode=False)
-        state = adapter.adapter(board, legal_moves, [episode_action_history[0]], encode=False)
-        state = adapter.adapter(board, legal_moves, episode_action_history, encode=False)
+        state = adapter.adapter(board.fen(), legal_moves, [], encode=False)
+        state = adapter.adapter(board.fen(), legal_moves, [episode_action_history[0]], encode=False)
+        state = adapter.adapter(board.fen(), legal_moves, episode_action_history, encode=False)
         # ---
         adapter = PriorActionsToLanguageAdapter()
-        state_encoded = adapter.adapter(board, legal_moves, [], encode=True)
-        state_encoded = adapter.adapter(board, legal_moves, [episode_action_history[0]], encode=True)
-        state_encoded = adapter.adapter(board, legal_moves, episode_action_history, encode=True)
+        state_encoded = adapter.adapter(board.fen(), legal_moves, [], encode=True)
+        state_encoded = adapter.adapter(board.fen(), legal_moves, [episode_action_history[0]], encode=True)
+        state_encoded = adapter.adapter(board.fen(), legal_moves, episode_action_history, encode=True)
         return state, state_encoded
\ No newline at end of file
@@ -0,0 +1,164 @@
+import os
+import json
+import fcntl
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+
+# Sentence -> id interner used by the indexed mode of every language adapter (StateAdapter.index)
+# - one id space for all adapters, ids are dense (0, 1, 2, ...) in first seen order and never change once given
+# - bounded: at most 'capacity' ids, later new sentences all get the overflow id (= capacity)
+# - with a path set the table is kept in memory-mapped files shared by every process using the same path, so
+#   parallel workers give a sentence the same id and indexed states/Q-tables can be compared and merged.
+#   New ids are added under a file lock, lookups are lock free. Sentences are saved in id order to sentences.jsonl.
+# - without a path the table is only kept in memory for this process
+# Set from config_local.json before adapters are built (see configure()), e.g.
+#   "sentence_interner": {"path": "./output/sentence_interner", "capacity": 1048576}
+INTERNER_SETTINGS: Dict[str, any] = {'path': None, 'capacity': 2**20, 'cache_size': 100000}
+# Interners are opened once per process, keyed by path
+_INTERNERS: Dict[str, 'SentenceInterner'] = {}
+
+
+def sentence_key(sentence: str) -> int:
+    """Stable non-zero 64-bit content key for a sentence."""
+    key = int.from_bytes(hashlib.blake2b(sentence.encode('utf-8'), digest_size=8).digest(), 'little')
+    return key if key != 0 else 1
+
+
+def configure(path: str = None, capacity: int = None, cache_size: int = None):
+    """Update interner settings, used by get_interner() calls after this one."""
+    if path is not None:
+        INTERNER_SETTINGS['path'] = path
+    if capacity is not None:
+        INTERNER_SETTINGS['capacity'] = capacity
+    if cache_size is not None:
+        INTERNER_SETTINGS['cache_size'] = cache_size
+
+
+class SentenceInterner:
+    """Open-addressing table of 64-bit sentence keys (0 = empty slot) to ids, with twice as many slots as ids
+       so probe runs stay short. Slots are never overwritten so an id, once given, is fixed for the table's life."""
+    def __init__(self, path: str = None, capacity: int = 2**20, cache_size: int = 100000):
+        self.path = path
+        self.capacity: int = capacity
+        self.cache_size: int = cache_size
+        # Recently used sentences, ids never change so these never go stale
+        self.cache: OrderedDict = OrderedDict()
+        self.overflowed: bool = False
+        if path is None:
+            self.keys = np.zeros(2*capacity, dtype=np.uint64)
+            self.slot_ids = np.zeros(2*capacity, dtype=np.int64)
+            self.count = np.zeros(1, dtype=np.int64)
+            self.sentences: List[str] = []
+        else:
+            self._open()
+
+    def _open(self):
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock():
+            meta_path = os.path.join(self.path, 'meta.json')
+            if os.path.exists(meta_path):
+                with open(meta_path) as meta_file:
+                    self.capacity = json.load(meta_file)['capacity']
+                mode = 'r+'
+            else:
+                with open(meta_path, 'w') as meta_file:
+                    json.dump({'capacity': self.capacity}, meta_file)
+                mode = 'w+'
+            self.keys = np.memmap(os.path.join(self.path, 'keys.u64'), dtype=np.uint64, mode=mode, shape=(2*self.capacity,))
+            self.slot_ids = np.memmap(os.path.join(self.path, 'ids.i64'), dtype=np.int64, mode=mode, shape=(2*self.capacity,))
+            self.count = np.memmap(os.path.join(self.path, 'count.i64'), dtype=np.int64, mode=mode, shape=(1,))
+        self.sentences = None
+
+    def _lock(self):
+        """Exclusive lock on the table files, held while ids are added."""
+        return FileLock(os.path.join(self.path, 'lock'))
+
+    def _find(self, key: np.uint64):
+        """(slot, id) of a key, id is None if the key is not in the table and slot is then the free slot to use."""
+        slot = int(key) % len(self.keys)
+        while True:
+            slot_key = self.keys[slot]
+            if slot_key == 0:
+                return slot, None
+            if slot_key == key:
+                return slot, int(self.slot_ids[slot])
+            slot = (slot + 1) % len(self.keys)
+
+    def _insert(self, sentence: str, key: np.uint64) -> int:
+        slot, sentence_id = self._find(key)
+        # Another process may have added the sentence since the lock free lookup
+        if sentence_id is not None:
+            return sentence_id
+        if self.count[0] >= self.capacity:
+            if not self.overflowed:
+                print("Sentence interner full (" + str(self.capacity) + " ids), new sentences share id " + str(self.capacity))
+                self.overflowed = True
+            return self.capacity
+        sentence_id = int(self.count[0])
+        # Id is written before its key so lock free readers never match a key without its id
+        self.slot_ids[slot] = sentence_id
+        self.keys[slot] = key
+        self.count[0] = sentence_id + 1
+        if self.path is None:
+            self.sentences.append(sentence)
+        else:
+            with open(os.path.join(self.path, 'sentences.jsonl'), 'a') as sentences_file:
+                sentences_file.write(json.dumps(sentence) + '\n')
+        return sentence_id
+
+    def id(self, sentence: str) -> int:
+        sentence_id = self.cache.get(sentence, None)
+        if sentence_id is not None:
+            self.cache.move_to_end(sentence)
+            return sentence_id
+        key = np.uint64(sentence_key(sentence))
+        slot, sentence_id = self._find(key)
+        if sentence_id is None:
+            if self.path is None:
+                sentence_id = self._insert(sentence, key)
+            else:
+                with self._lock():
+                    sentence_id = self._insert(sentence, key)
+        if sentence_id < self.capacity:
+            self.cache[sentence] = sentence_id
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return sentence_id
+
+    def ids(self, sentences: List[str]) -> List[int]:
+        return [self.id(sentence) for sentence in sentences]
+
+    def __len__(self) -> int:
+        return int(self.count[0])
+
+    def vocabulary(self) -> List[str]:
+        """Sentences in id order."""
+        if self.path is None:
+            return list(self.sentences)
+        with open(os.path.join(self.path, 'sentences.jsonl')) as sentences_file:
+            return [json.loads(line) for line in sentences_file]
+
+
+class FileLock:
+    """Exclusive fcntl lock on a file, shared by processes using the same path."""
+    def __init__(self, lock_path: str):
+        self.lock_path = lock_path
+
+    def __enter__(self):
+        self.lock_file = open(self.lock_path, 'a')
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        self.lock_file.close()
+
+
+def get_interner() -> SentenceInterner:
+    """Shared interner for this process, from the current settings."""
+    path = INTERNER_SETTINGS['path']
+    if path not in _INTERNERS:
+        _INTERNERS[path] = SentenceInterner(path, INTERNER_SETTINGS['capacity'], INTERNER_SETTINGS['cache_size'])
+    return _INTERNERS[path]
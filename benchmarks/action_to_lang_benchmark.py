@@ -0,0 +1,277 @@
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List, Tuple
+from functools import lru_cache
+import chess
+from chess import Board, SQUARES_180
+
+# Run from anywhere, language_info files are loaded relative to the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from adapters.adapter_abstract import StateAdapter, LOGIC_DF, PIECE_NAME_LOOKUP, PROMO_CHOICE_MAP
+
+# Before/after micro-benchmark of the move description used by the possible/prior actions adapters
+# - before: the baseline board_to_lang + uci_to_lang_action + action_to_lang (piece logic dict rebuilt on every call),
+#   copied below with the helpers they call so the reference does not change with StateAdapter
+# - after: StateAdapter.move_to_lang compiled table lookup
+# Both are run over every legal move of positions from seeded random games and must give identical output.
+
+
+def legacy_compact_lst(board: Board) -> List[str]:
+    """Copy of compact_lst at the baseline."""
+    builder = ["."] * len(SQUARES_180)
+    for i, square in enumerate(SQUARES_180):
+        piece = board.piece_at(square)
+
+        if piece:
+            builder[i] = piece.symbol()
+
+    return builder
+
+
+@lru_cache(maxsize=10000)
+def legacy_board_to_lang(board_fen: str):
+    """Copy of board_to_lang at the baseline, board as a list of {board_pos, player_name, piece_id, piece_des_name}."""
+    # Board from engine needs to be flipped for White's POV
+    board_flip = Board(board_fen)
+    board_flip.apply_transform(chess.flip_vertical)
+    # Transform into 1-D list
+    board_lst = legacy_compact_lst(board_flip)
+    # Connect piece to grid location, SQUARE_NAMES defines 2-d position (e.g. e2) in a single list
+    square_names_lst: List[str] = chess.SQUARE_NAMES
+    # Rename each piece to simple naming convention (e.g. 'White King')
+    board_df_src: List[Dict[str, str]] = list()
+    for p in range(0, len(board_lst)):
+        piece_des_name = 'init'
+        piece_id = board_lst[p]
+        board_pos = square_names_lst[p]
+        # Extract piece descriptive name from lookup
+        piece_des_name = PIECE_NAME_LOOKUP["piece_names"][piece_id]
+        # Error handling if piece name is not overridden
+        if (piece_des_name == 'init'):
+            print("ERROR: board_to_lang_df function not mapping all pieces to names")
+            print(piece_id)
+        else:
+            if piece_des_name != '.':
+                row = {"board_pos": board_pos, "player_name":piece_des_name.split(" ")[0] , "piece_id": piece_id, "piece_des_name": piece_des_name.split(" ")[1]}
+            else:
+                row = {"board_pos": board_pos, "player_name":'.' , "piece_id":'.', "piece_des_name": '.'}
+            board_df_src.append(row)
+    return board_df_src
+
+
+def legacy_board_pos2piece_nm(board_fen:str, start_pos:str):
+    """Copy of board_pos2piece_nm at the baseline."""
+    piece_nm = 'init'
+    # Find piece name based on current board configuration extracted in Language from board_to_lang
+    board_current_lang = legacy_board_to_lang(board_fen)
+    for piece in reversed(board_current_lang):
+        if (piece["board_pos"] == start_pos):
+            if piece['player_name']=='.':
+                print("ERROR: Player Name not found for start pos - ", start_pos)
+                print(" ")
+                print(board_fen)
+            piece_nm = piece["player_name"] + ' ' + piece["piece_des_name"]
+            break
+    return piece_nm
+
+
+def legacy_uci_to_lang_action(move_uci: str, board_fen: str):
+    """Copy of uci_to_lang_action at the baseline."""
+    start_pos = move_uci[0:2]
+    end_pos = move_uci[2:4]
+    piece_nm = legacy_board_pos2piece_nm(board_fen, start_pos)
+    # Create Language based action based on piece name and start -> end grid position
+    # - Pawn promo
+    if (piece_nm != ".") and (piece_nm[6:]=='Pawn') and ((end_pos[1]=='8') or (end_pos[1]=='1')):
+        promo_choice = move_uci[4].lower()
+        promotion_piece = PROMO_CHOICE_MAP[promo_choice]
+        # Pawn promo with capture        
+        if start_pos[0] != end_pos[0]:
+            lang_action = str(piece_nm) + ' at ' + str(start_pos) + ' captures a piece on ' + str(end_pos) + ' and is promoted to a ' + str(promotion_piece) 
+        # Standard pawn promotion
+        else: 
+            lang_action = str(piece_nm) + ' at ' + str(start_pos) + ' promoted to a ' + str(promotion_piece) 
+    # - Other unknown moves, e.g. castling
+    elif piece_nm == 'init':
+        print("Error: Invalid move_uci, no piece name can be found")
+        print("Input uci:", move_uci)
+        print(Board(board_fen))
+        lang_action = "ERROR"
+    # - Most moves
+    else:
+        lang_action = str(piece_nm) + " from " + str(start_pos) + " to " + str(end_pos)
+    return lang_action
+
+
+def legacy_move_logics(player_nm: str, start_i: str, end_i: str, start_j: int, end_j: int, LANG_action) -> Tuple[str, int]:
+    """Copy of move_logics at the baseline."""
+    # White move logics
+    if (player_nm == 'White'):
+        if (start_j < end_j) & (start_i < end_i):
+            move_dir = 'forwards and right'
+        elif (start_j < end_j) & (start_i > end_i):
+            move_dir = 'forwards and left'
+        elif (start_j < end_j):
+            move_dir = 'forwards'
+        elif (start_j > end_j) & (start_i < end_i):
+            move_dir = 'backwards and right'
+        elif (start_j > end_j) & (start_i > end_i):
+            move_dir = 'backwards and left'
+        elif (start_j > end_j):
+            move_dir = 'backwards'
+        elif (start_i < end_i):
+            move_dir = 'right'
+        elif (start_i > end_i):
+            move_dir = 'left'
+        else:
+            print("Error: invalid move direction")
+            print(LANG_action)
+
+    # Black move logics
+    elif (player_nm == 'Black'):
+        if (start_j > end_j) & (start_i > end_i):
+            move_dir = 'forwards and right'
+        elif (start_j > end_j) & (start_i < end_i):
+            move_dir = 'forwards and left'
+        elif (start_j > end_j):
+            move_dir = 'forwards'
+        elif (start_j < end_j) & (start_i > end_i):
+            move_dir = 'backwards and right'
+        elif (start_j < end_j) & (start_i < end_i):
+            move_dir = 'backwards and left'
+        elif (start_j < end_j):
+            move_dir = 'backwards'
+        elif (start_i > end_i):
+            move_dir = 'right'
+        elif (start_i < end_i):
+            move_dir = 'left'
+        else:
+            print("Error: invalid move direction")
+            print(LANG_action)
+    else:
+        print("Error: invalid player name")
+        print(LANG_action)
+
+    move_dis = abs(end_j - start_j) if not(move_dir in ["left", "right"]) else abs(ord(end_i) - ord(start_i))
+    return move_dir, move_dis
+
+
+def legacy_action_to_lang(LANG_action: str, board_fen):
+    """Copy of action_to_lang before the move logic table was compiled."""
+    LANG_action_split = LANG_action.split(" ")
+    player_nm = LANG_action_split[0]
+    piece_nm = LANG_action_split[1]
+    start = LANG_action_split[3]
+    start_i = start[0]
+    start_j = int(start[1])
+    # Pawn doesn't get changed
+    if 'promoted' in LANG_action:
+        LANG_action_description = LANG_action
+    else:
+        end = LANG_action_split[5]
+        end_i = end[0]
+        end_j = int(end[1])
+        # Checks to see if final location matches an opponent's piece
+        board_PRIOR_Lang = legacy_board_to_lang(board_fen)
+        end_piece = [piece for piece in board_PRIOR_Lang if (end in piece["board_pos"])][0]["piece_des_name"]
+        captured_piece = end_piece.lower() if (end_piece != ".") else ""
+
+        move_dir, move_dis = legacy_move_logics(player_nm, start_i, end_i, start_j, end_j, LANG_action)
+    
+        piece_logic: Dict[Tuple[str], str] = {(r["Player"], r["Piece"], r["Move_dir"], r["Move_type"]): r["Language"] 
+                                                for r in LOGIC_DF.to_records()}
+        if piece_nm == 'Pawn':
+            if (move_dir == 'forwards'):
+                language = piece_logic[(player_nm, piece_nm, move_dir, "moves")]
+            elif move_dir.split(' ')[2] in ['right', 'left']:
+                language = piece_logic[(player_nm, piece_nm, move_dir, "captures piece [N] by moving diagonally")]
+            else:
+                print("ERROR")
+        else:
+            if captured_piece != '':
+                language = piece_logic.get((player_nm, piece_nm, move_dir, "captures piece [N] by moving"), None)
+                if (not language):
+                    language = piece_logic[(player_nm, piece_nm, move_dir, "captures piece [N] by moving diagonally")]
+            else:
+                language = piece_logic.get((player_nm, piece_nm, move_dir, "moves"), None)
+                if (not language):
+                    language = piece_logic[(player_nm, piece_nm, move_dir, "moves diagonally")]
+                                    
+        desc = language.replace('{ij}', start) # Replaces string with piece start pos
+        if 'captures' in desc:
+            LANG_action_description = desc.replace('[N]', captured_piece)
+        else:
+            LANG_action_description = desc 
+        if piece_nm == 'knight':
+            desc_split = LANG_action_description.split('|')
+            desc_split_sub = desc_split[2].split('*')
+            LANG_action_description = desc_split[0] + str(move_dis) + desc_split_sub[0] + str(abs(end_i-start_i) )
+        else:
+            desc_split = LANG_action_description.split('|')
+            LANG_action_description = desc_split[0] + str(move_dis) + desc_split[2]
+    return LANG_action_description
+
+
+def sample_positions(num_games: int, max_plies: int, seed: int):
+    """(fen, legal uci moves) for every ply of seeded random games."""
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(num_games):
+        board = chess.Board()
+        for _ in range(max_plies):
+            legal_moves = [move.uci() for move in board.legal_moves]
+            if (len(legal_moves) == 0) | board.is_game_over():
+                break
+            positions.append((board.fen(), legal_moves))
+            board.push_uci(rng.choice(legal_moves))
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', type=int, default=50)
+    parser.add_argument('--plies', type=int, default=80)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    positions = sample_positions(args.games, args.plies, args.seed)
+    num_moves = sum([len(legal_moves) for fen, legal_moves in positions])
+    # Board language is cached by FEN in both versions, warm it so only the description lookup is timed
+    for fen, legal_moves in positions:
+        legacy_board_to_lang(fen)
+        StateAdapter.board_squares(fen)
+
+    start = time.perf_counter()
+    before = [legacy_action_to_lang(legacy_uci_to_lang_action(move, fen), fen)
+              for fen, legal_moves in positions for move in legal_moves]
+    before_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = [StateAdapter.move_to_lang(move, fen) for fen, legal_moves in positions for move in legal_moves]
+    after_time = time.perf_counter() - start
+
+    # Second pass shows the steady state once the description table is filled
+    start = time.perf_counter()
+    [StateAdapter.move_to_lang(move, fen) for fen, legal_moves in positions for move in legal_moves]
+    warm_time = time.perf_counter() - start
+
+    mismatches = sum([b != a for b, a in zip(before, after)])
+    print("Positions:", len(positions), "| Moves described:", num_moves)
+    print("Before (per-call logic dict): {:.2f} us/move".format(1e6*before_time/num_moves))
+    print("After  (compiled table, cold): {:.2f} us/move".format(1e6*after_time/num_moves))
+    print("After  (compiled table, warm): {:.2f} us/move".format(1e6*warm_time/num_moves))
+    print("Speed up (cold): {:.1f}x".format(before_time/after_time))
+    print("Table entries:", StateAdapter.move_description.cache_info().currsize)
+    print("Mismatches:", mismatches)
+    if mismatches > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import platform
+import argparse
+import statistics
+from typing import Dict, List
+
+# Run from anywhere, data files are loaded relative to the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import chess
+import chess.polyglot
+import pandas as pd
+
+# Regression benchmarks for the engine, state adapters and opponents
+# - corpus: a fixed set of games built from the opening lines in language_info/Language_moves.csv and the most
+#   played opening book lines, each continued with seeded random moves to CORPUS_PLIES plies
+# - engine: Engine.step and legal_move_generator over every corpus ply
+# - adapter/<name>/<mode>: each STATE_ADAPTER_TYPES entry over the corpus in language, encode, indexed and key modes
+# - opponent/sampled: SampledAgent.policy over the corpus positions
+# - episode_loop/<opponent>: full Environment.episode_loop against the Random and Sampled opponents
+# Results are written as JSON and can be compared against a stored baseline:
+#   python benchmarks/benchmark_suite.py --output benchmarks/results/latest.json --baseline benchmarks/results/baseline.json
+# Benchmarks that cannot run here (e.g. data files not built) are recorded as skipped with the reason.
+LANGUAGE_MOVES_PATH = './language_info/Language_moves.csv'
+CORPUS_SEED = 0
+CORPUS_PLIES = 40
+CORPUS_BOOK_LINES = 8
+CORPUS_RANDOM_GAMES = 8
+ADAPTER_MODES = {'language': {'encode': False, 'indexed': False},
+                 'encode': {'encode': True, 'indexed': False},
+                 'indexed': {'encode': False, 'indexed': True},
+                 'key': {'encode': False, 'indexed': False, 'keyed': True}}
+
+
+# ------ Corpus -----------------------------------------
+def language_moves_lines(path: str = LANGUAGE_MOVES_PATH) -> List[List[str]]:
+    """Opening lines of Language_moves.csv as UCI moves, e.g. '[e4,e5], [Nf3,Nc6], [d4]'."""
+    lines = []
+    for actions in pd.read_csv(path)['Actions'].dropna():
+        board = chess.Board()
+        line = []
+        for san in actions.replace('[', '').replace(']', '').split(','):
+            if len(san.strip()) > 0:
+                move = board.parse_san(san.strip())
+                line.append(move.uci())
+                board.push(move)
+        lines.append(line)
+    return lines
+
+
+def opening_book_lines(num_lines: int, depth: int) -> List[List[str]]:
+    """The most played continuation of each of the most played first moves in the opening book."""
+    from adapters.adapter_abstract import ACTION_UCI
+    from environment.opponent_agents.opening_book import load_book
+    book = load_book()
+    board = chess.Board()
+    known = book.moves(chess.polyglot.zobrist_hash(board))
+    if known is None:
+        return []
+    first_actions, first_counts = known
+    lines = []
+    for first in [first_actions[n] for n in sorted(range(len(first_actions)), key=lambda n: -first_counts[n])][:num_lines]:
+        board = chess.Board()
+        line = []
+        action = first
+        while (action is not None) and (len(line) < depth):
+            line.append(str(ACTION_UCI[action]))
+            board.push_uci(line[-1])
+            known = book.moves(chess.polyglot.zobrist_hash(board))
+            action = known[0][int(known[1].argmax())] if (known is not None) and (known[1].max() > 0) else None
+        lines.append(line)
+    return lines
+
+
+def build_corpus(plies: int = CORPUS_PLIES, seed: int = CORPUS_SEED) -> List[List[str]]:
+    """Fixed list of games (UCI moves), every line is continued with seeded random legal moves to 'plies' plies."""
+    lines = language_moves_lines()
+    try:
+        lines += opening_book_lines(CORPUS_BOOK_LINES, plies)
+    except (OSError, ValueError) as error:
+        print("Opening book lines not added to corpus:", repr(error))
+    lines += [[] for _ in range(CORPUS_RANDOM_GAMES)]
+    rng = random.Random(seed)
+    corpus = []
+    for line in lines:
+        board = chess.Board()
+        for move_uci in line:
+            board.push_uci(move_uci)
+        game = list(line)
+        while (len(game) < plies) and (not board.is_game_over()):
+            move = rng.choice(sorted(board.legal_moves, key=lambda m: m.uci()))
+            game.append(move.uci())
+            board.push(move)
+        corpus.append(game)
+    return corpus
+
+
+def corpus_hash(corpus: List[List[str]]) -> str:
+    return hashlib.blake2b(json.dumps(corpus).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def corpus_positions(corpus: List[List[str]]) -> List[List[dict]]:
+    """Per game, the adapter inputs of every position: FEN, legal moves, action history and position key."""
+    from environment.engine import Engine
+    engine = Engine()
+    games = []
+    for game in corpus:
+        positions = []
+        obs = engine.reset()
+        for n, move_uci in enumerate(game + [None]):
+            positions.append({'board_fen': obs, 'legal_moves': list(engine.legal_move_generator()),
+                              'episode_action_history': game[:n], 'position_key': engine.position_key})
+            if move_uci is not None:
+                obs, reward, terminated = engine.step(state=obs, action=move_uci)
+        games.append(positions)
+    return games
+
+
+# ------ Benchmarks -----------------------------------------
+def timing(calls: int, seconds: float) -> Dict[str, float]:
+    return {'calls': calls, 'total_s': seconds, 'us_per_call': seconds/max(calls, 1)*1e6,
+            'calls_per_s': calls/seconds if seconds > 0 else 0.0}
+
+
+def bench_engine(corpus: List[List[str]]) -> Dict[str, dict]:
+    from environment.engine import Engine
+    engine = Engine()
+    step_s = 0.0
+    legal_s = 0.0
+    plies = 0
+    for game in corpus:
+        obs = engine.reset()
+        for move_uci in game:
+            start = time.perf_counter()
+            engine.legal_move_generator(obs)
+            legal_s += time.perf_counter() - start
+            start = time.perf_counter()
+            obs, reward, terminated = engine.step(state=obs, action=move_uci)
+            step_s += time.perf_counter() - start
+            plies += 1
+    results = {'engine/step': timing(plies, step_s), 'engine/legal_move_generator': timing(plies, legal_s)}
+    results['engine/ply'] = timing(plies, step_s + legal_s)
+    return results
+
+
+def bench_adapter(adapter_type, games: List[List[dict]], mode: str) -> Dict[str, float]:
+    """A fresh adapter per game, as the environment builds one per run and history is kept per game."""
+    calls = 0
+    seconds = 0.0
+    for positions in games:
+        adapter = adapter_type()
+        start = time.perf_counter()
+        for position in positions:
+            adapter.adapter(**position, **ADAPTER_MODES[mode])
+        seconds += time.perf_counter() - start
+        calls += len(positions)
+    return timing(calls, seconds)
+
+
+def bench_sampled_agent(games: List[List[dict]]) -> Dict[str, float]:
+    from environment.opponent_agents.sampled_agent import SampledAgent
+    agent = SampledAgent()
+    positions = [position for game in games for position in game if position['legal_moves'] != [""]]
+    # The book is opened on first use, not part of the per call time
+    agent.policy(positions[0]['board_fen'], positions[0]['legal_moves'], position_key=positions[0]['position_key'])
+    random.seed(CORPUS_SEED)
+    start = time.perf_counter()
+    for position in positions:
+        agent.policy(position['board_fen'], position['legal_moves'], position_key=position['position_key'])
+    return timing(len(positions), time.perf_counter() - start)
+
+
+def bench_episode_loop(opponent: str, episodes: int, adapter: str) -> Dict[str, float]:
+    """Environment.episode_loop with a random white agent, so the time is spent in the environment not in learning."""
+    from environment.env import Environment
+    from helios_rl.agents.random_agent import RandomAgent
+    with open('./config.json') as config_file:
+        local_setup_info = json.load(config_file)
+    with open('./config_local.json') as config_file:
+        local_setup_info.update(json.load(config_file))
+    local_setup_info.update({'agent_type': 'Random', 'agent_name': 'Random_' + adapter, 'agent': RandomAgent(),
+                             'adapter_select': adapter, 'number_training_episodes': episodes, 'number_test_episodes': episodes,
+                             'training_opponent_agent': opponent, 'testing_opponent_agent': opponent,
+                             'live_env': True, 'train': True, 'training_results': False,
+                             'observed_states': False, 'experience_sampling': False,
+                             'vector_envs': 1, 'phase_timers': False, 'results_sink': {}})
+    random.seed(CORPUS_SEED)
+    env = Environment(local_setup_info)
+    start = time.perf_counter()
+    env.episode_loop()
+    seconds = time.perf_counter() - start
+    # Calls are episodes
+    return timing(env.num_train_episodes, seconds)
+
+
+def run_suite(args) -> dict:
+    corpus = build_corpus(args.plies)
+    games = corpus_positions(corpus)
+    suite = {'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'repeats': args.repeats,
+                      'corpus_games': len(corpus), 'corpus_plies': sum([len(game) for game in corpus]),
+                      'corpus_hash': corpus_hash(corpus), 'time': time.strftime('%Y-%m-%d %H:%M:%S')},
+             'results': {}}
+    # Each benchmark returns {result name: timing}
+    benchmarks = {}
+    if 'engine' in args.only:
+        benchmarks['engine'] = lambda: bench_engine(corpus)
+    if 'adapters' in args.only:
+        from environment.env import STATE_ADAPTER_TYPES
+        for name, adapter_type in STATE_ADAPTER_TYPES.items():
+            for mode in ADAPTER_MODES:
+                key = 'adapter/' + name + '/' + mode
+                benchmarks[key] = (lambda key=key, adapter_type=adapter_type, mode=mode: {key: bench_adapter(adapter_type, games, mode)})
+    if 'opponents' in args.only:
+        benchmarks['opponent/sampled'] = lambda: {'opponent/sampled': bench_sampled_agent(games)}
+    if 'episode_loop' in args.only:
+        for opponent in ['Random', 'Sampled']:
+            key = 'episode_loop/' + opponent
+            benchmarks[key] = (lambda key=key, opponent=opponent: {key: bench_episode_loop(opponent, args.episodes, args.episode_adapter)})
+
+    for name, benchmark in benchmarks.items():
+        try:
+            # Median of the repeats per result
+            runs = [benchmark() for _ in range(args.repeats)]
+        except Exception as error:
+            suite['results'][name] = {'skipped': repr(error)}
+            print("{:<48} skipped: {}".format(name, repr(error)[:80]))
+            continue
+        for key in runs[0]:
+            suite['results'][key] = {stat: statistics.median([run[key][stat] for run in runs]) for stat in runs[0][key]}
+            print("{:<48} {:>12.2f} us/call {:>10} calls".format(key, suite['results'][key]['us_per_call'], int(suite['results'][key]['calls'])))
+    return suite
+
+
+def compare(suite: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Names of results slower than the baseline by more than 'tolerance' (fraction of the baseline time)."""
+    if suite['meta']['corpus_hash'] != baseline['meta']['corpus_hash']:
+        print("WARNING: corpus differs from the baseline corpus, per call times may not be comparable")
+    regressions = []
+    print("{:<48} {:>12} {:>12} {:>9}".format('benchmark', 'baseline us', 'current us', 'change'))
+    for name, result in suite['results'].items():
+        base = baseline['results'].get(name, {})
+        if ('us_per_call' not in result) or ('us_per_call' not in base) or (base['us_per_call'] == 0):
+            continue
+        change = result['us_per_call']/base['us_per_call'] - 1
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = ' REGRESSION'
+        print("{:<48} {:>12.2f} {:>12.2f} {:>+8.1f}%{}".format(name, base['us_per_call'], result['us_per_call'], change*100, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine, adapter and opponent benchmarks with baseline comparison.")
+    parser.add_argument('--only', default='engine,adapters,opponents,episode_loop', help="comma separated benchmark groups")
+    parser.add_argument('--plies', type=int, default=CORPUS_PLIES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--episodes', type=int, default=50, help="episodes per episode_loop benchmark")
+    parser.add_argument('--episode_adapter', default='Engine', help="STATE_ADAPTER_TYPES entry used by the episode_loop benchmarks")
+    parser.add_argument('--output', default='./benchmarks/results/latest.json')
+    parser.add_argument('--baseline', default=None, help="baseline results JSON to compare against")
+    parser.add_argument('--save_baseline', default=None, help="also save these results as a baseline")
+    parser.add_argument('--book_dir', default=None, help="opening book directory, default environment.opponent_agents.opening_book.BOOK_DIR")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown against the baseline, e.g. 0.2 = 20%%")
+    args = parser.parse_args()
+    args.only = args.only.split(',')
+    if args.book_dir is not None:
+        from environment.opponent_agents import opening_book
+        opening_book.BOOK_DIR = args.book_dir
+
+    suite = run_suite(args)
+    for path in [args.output, args.save_baseline]:
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as results_file:
+                json.dump(suite, results_file, indent=1)
+            print("Results saved to", path)
+
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(suite, json.load(baseline_file), args.tolerance)
+        if len(regressions) > 0:
+            print(len(regressions), "benchmarks regressed by more than", str(args.tolerance*100) + "%")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import subprocess
+
+# Run from anywhere, data files are loaded relative to the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# Startup time and peak RSS of building the training + testing SampledAgent opponents
+# - before: each agent parses move_stats.json + stats_map.json and merges the counts
+# - after: both agents share the compiled opening book opened through a memory map
+# Each case runs in a fresh process so peak RSS is not shared between them.
+# Build the book first with: python -m environment.opponent_agents.opening_book
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+
+def legacy_agent_data(move_stats_path: str, stats_map_path: str) -> dict:
+    """Copy of SampledAgent.__init__ loading before the opening book."""
+    with open(move_stats_path, 'r') as json_file:
+        player_data_dict = json.load(json_file)
+    with open(stats_map_path, 'r') as json_file:
+        player_data_counts_dict = json.load(json_file)
+    for board_fen in list(player_data_dict.keys()):
+        for move_uci in list(player_data_dict[board_fen].keys()):
+            if (board_fen in player_data_counts_dict):
+                if (move_uci in player_data_counts_dict[board_fen]):
+                    player_data_dict[board_fen][move_uci]["count"] = player_data_counts_dict[board_fen][move_uci]['totalGames']
+                else:
+                    player_data_dict[board_fen][move_uci]["count"] = 0
+            else:
+                player_data_dict[board_fen][move_uci]["count"] = 0
+    return player_data_dict
+
+
+def run_case(case: str, args):
+    """Runs in the child process, prints a JSON line of results."""
+    import chess
+    from environment.opponent_agents import opening_book
+    from environment.opponent_agents.sampled_agent import SampledAgent
+    start_rss = peak_rss_mb()
+    start = time.perf_counter()
+    if case == 'before':
+        agents = [legacy_agent_data(args.move_stats, args.stats_map) for _ in range(2)]
+    else:
+        opening_book.BOOK_DIR = args.book_dir
+        agents = [SampledAgent() for _ in range(2)]
+        # The book is opened on first use, include it in start up
+        for agent in agents:
+            agent.policy(chess.Board().fen(), ['e2e4'])
+    startup = time.perf_counter() - start
+    print(json.dumps({'case': case, 'startup_s': startup, 'peak_rss_mb': peak_rss_mb(), 'rss_increase_mb': peak_rss_mb() - start_rss}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--move_stats', default='./language_info/move_stats.json')
+    parser.add_argument('--stats_map', default='./language_info/stats_map.json')
+    parser.add_argument('--book_dir', default='./language_info/opening_book')
+    parser.add_argument('--case', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case is not None:
+        return run_case(args.case, args)
+
+    results = []
+    for case in ['before', 'after']:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', case,
+                                 '--move_stats', args.move_stats, '--stats_map', args.stats_map, '--book_dir', args.book_dir],
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().split('\n')[-1]))
+    for result in results:
+        print("{:<7} start up: {:.3f}s | peak RSS: {:.1f}MB | RSS increase: {:.1f}MB".format(
+            result['case'], result['startup_s'], result['peak_rss_mb'], result['rss_increase_mb']))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,41 +1,291 @@
 # Engine used to obtain move scores
+import random
+from typing import Dict, List, Union
+import numpy as np
+import torch
 import chess.engine
-from chess import Board
+import chess.polyglot
+from chess import Board, Move
+# Compact action index shared with adapters and agents
+from adapters.adapter_abstract import NUM_ACTIONS, ACTION_MOVES, action_ids
+
+# Sum of piece types (pawn=1 ... king=6) for the standard start position
+START_PIECE_TYPE_TOTAL = 74
+# Default ply limit of a rollout playout
+PLAYOUT_MAX_PLIES = 100
+# Polyglot Zobrist keys, position_key matches chess.polyglot.zobrist_hash(board)
+ZOBRIST_ARRAY = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+ZOBRIST_HASHER = chess.polyglot.ZobristHasher(ZOBRIST_ARRAY)
+
 class Engine:
     """Defines the environment function from the generator engine.
        Expects the following:
         - reset() to reset the env a start position(s)
         - step() to make an action and update the game state
         - legal_moves_generator() to generate the list of legal moves
+       A Move-object fast path is also provided:
+        - legal_moves() returns the chess.Move list for the current ply (cached until the next push)
+        - step_move() takes a chess.Move or an index into legal_moves() with no UCI/SAN round trip
+        - legal_move_mask() marks the legal moves over the action index (adapters.adapter_abstract.ACTION_UCI)
+       Running material, capture and result info is kept up to date as moves are pushed
+       so terminal/reward checks do not need to re-parse the board from FEN.
+       position_key is the 64-bit polyglot Zobrist key of the current position, updated incrementally,
+       and is used in place of the FEN for position lookups (adapters, opening book).
+       A rollout interface is provided for lookahead and Monte-Carlo evaluation, none of it generates FEN:
+        - push()/pop() and snapshot()/restore() move through lines of play from the current position
+        - playout()/playouts() play random or opening book guided games to the sub-goal and return outcome statistics
+        - move_playouts() runs playouts after each legal move of the current position
     """
     def __init__(self) -> None:
         """Initialize Engine"""
         self.board: Board = chess.Board()
-        
+        self._reset_game_state()
+
+    def _reset_game_state(self):
+        """Reset the running game state to match the board."""
+        self.piece_type_total: int = sum([piece.piece_type for piece in self.board.piece_map().values()])
+        self.capture_made: bool = False
+        self.terminated: bool = False
+        self.result: str = '*'
+        self.position_key: int = chess.polyglot.zobrist_hash(self.board)
+        # Running game state and legal move cache before each pushed move, restored by pop()
+        self._state_stack: list = []
+        self._clear_legal_moves()
+
+    def _clear_legal_moves(self):
+        """Invalidate the legal move cache for the current ply."""
+        self._legal_moves: List[Move] = None
+        self._legal_move_set: set = None
+        self._legal_moves_uci: List[str] = None
+        self._legal_action_ids: np.ndarray = None
+
     def reset(self):
         """Fully reset the environment."""
         self.board.reset()
+        self._reset_game_state()
         obs = self.board.fen()
         return obs
 
+    def _square_keys(self, squares: list) -> int:
+        """Zobrist keys of the pieces on the given squares."""
+        key = 0
+        for square in squares:
+            piece = self.board.piece_at(square)
+            if piece:
+                key ^= ZOBRIST_ARRAY[64*((piece.piece_type-1)*2 + int(piece.color)) + square]
+        return key
+
+    def _state_keys(self) -> int:
+        """Zobrist keys of the castling rights, en passant file and turn."""
+        return ZOBRIST_HASHER.hash_castling(self.board) ^ ZOBRIST_HASHER.hash_ep_square(self.board) ^ ZOBRIST_HASHER.hash_turn(self.board)
+
+    def _push(self, move: chess.Move):
+        """Push a move and update the running game state."""
+        self._state_stack.append((self.piece_type_total, self.capture_made, self.terminated, self.result, self.position_key,
+                                  self._legal_moves, self._legal_move_set, self._legal_moves_uci, self._legal_action_ids))
+        # Squares whose piece can change: en passant removes a pawn beside the target, castling moves a rook on the back rank
+        squares = [move.from_square, move.to_square]
+        if self.board.is_en_passant(move):
+            squares.append(chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square)))
+        elif self.board.is_castling(move):
+            squares = chess.SquareSet(chess.BB_RANKS[chess.square_rank(move.from_square)])
+        self.position_key ^= self._square_keys(squares) ^ self._state_keys()
+        if self.board.is_capture(move):
+            self.capture_made = True
+            if self.board.is_en_passant(move):
+                self.piece_type_total -= chess.PAWN
+            else:
+                self.piece_type_total -= self.board.piece_type_at(move.to_square)
+        if move.promotion:
+            self.piece_type_total += move.promotion - chess.PAWN
+        self.board.push(move)
+        self.position_key ^= self._square_keys(squares) ^ self._state_keys()
+        self._clear_legal_moves()
+        outcome = self.board.outcome()
+        self.terminated = outcome is not None
+        self.result = outcome.result() if self.terminated else '*'
+
     def step(self, state:any, action:any):
         """Enact an action."""
         # In problems where the agent can choose to reset the env
         if (state=="ENV_RESET")|(action=="ENV_RESET"):
             self.reset()
-            
-        self.board.push_san(self.board.san(chess.Move.from_uci(action)))
+
+        move = chess.Move.from_uci(action)
+        if move not in self.legal_move_set():
+            raise chess.IllegalMoveError(f"illegal uci: {action!r} in {self.board.fen()}")
+        self._push(move)
         obs = self.board.fen()
-        terminated = self.board.is_game_over()
+        terminated = self.terminated
         # Chess engine does not provide a reward signal by itself
         # - set default per action
         reward = 0
-        
+
+        return obs, reward, terminated
+
+    def step_move(self, action:Union[Move, int]):
+        """Enact an action given as a chess.Move or an index into legal_moves()."""
+        if isinstance(action, int):
+            move = self.legal_moves()[action]
+        elif action in self.legal_move_set():
+            move = action
+        else:
+            raise chess.IllegalMoveError(f"illegal move: {action!r} in {self.board.fen()}")
+        self._push(move)
+        obs = self.board.fen()
+        terminated = self.terminated
+        reward = 0
+
         return obs, reward, terminated
 
+    def sub_goal_reached(self, sub_goal:list) -> bool:
+        """Check the sub-goal against the running game state."""
+        if 'first_capture' in sub_goal:
+            return self.piece_type_total < START_PIECE_TYPE_TOTAL
+        return self.board.fen() in sub_goal
+
+    def goal_reached(self, sub_goal:list, action_num:int, action_cap:int) -> bool:
+        """Terminal check for the current position, equivalent to Environment.goal_reached."""
+        # Engine terminal state reached
+        if self.terminated:
+            return True
+        # Action cap reached
+        if action_num == action_cap:
+            return True
+        # Sub-goal reached
+        if sub_goal:
+            return self.sub_goal_reached(sub_goal)
+        return False
+
+    def legal_moves(self) -> List[Move]:
+        """Legal moves as chess.Move objects, generated once per ply."""
+        if self._legal_moves is None:
+            self._legal_moves = list(self.board.legal_moves)
+        return self._legal_moves
+
+    def legal_move_set(self) -> set:
+        """Legal moves as a set for membership checks, generated once per ply."""
+        if self._legal_move_set is None:
+            self._legal_move_set = set(self.legal_moves())
+        return self._legal_move_set
+
+    def legal_action_ids(self) -> np.ndarray:
+        """Action ids of the legal moves, in legal_moves() order."""
+        if self._legal_action_ids is None:
+            self._legal_action_ids = action_ids(self.legal_moves())
+        return self._legal_action_ids
+
+    def legal_move_mask(self, as_tensor:bool = False):
+        """Boolean mask over the action index, True for legal moves."""
+        mask = np.zeros(NUM_ACTIONS, dtype=bool)
+        mask[self.legal_action_ids()] = True
+        if as_tensor:
+            return torch.from_numpy(mask)
+        return mask
+
+    def step_action(self, action_id:int):
+        """Enact an action given by its id in the action index."""
+        return self.step_move(ACTION_MOVES[action_id])
+
     def legal_move_generator(self, obs:any=None):
         """Define legal moves at each position"""
-        legal_moves = str(list(self.board.legal_moves)).replace(" Move.from_uci('","").replace("[Move.from_uci('","").replace("')","").replace("]","").split(",")
-        legal_moves = legal_moves if (legal_moves != "[]") else [""]
-        return legal_moves
+        # The UCI list is cached for the current ply so repeat calls in the episode loop reuse it
+        # - callers must not modify the returned list
+        if self._legal_moves_uci is None:
+            legal_moves = [move.uci() for move in self.legal_moves()]
+            self._legal_moves_uci = legal_moves if (len(legal_moves) > 0) else [""]
+        return self._legal_moves_uci
+
+    # ------ Rollout interface -----------------------------------------
+    def push(self, move:Union[Move, int]) -> bool:
+        """Push a legal chess.Move or an index into legal_moves(), no FEN is generated. Returns terminated.
+        Moves are not checked, use step_move() for moves that may be illegal."""
+        if isinstance(move, int):
+            move = self.legal_moves()[move]
+        self._push(move)
+        return self.terminated
+
+    def pop(self) -> Move:
+        """Take back the last move, restoring the running game state and the legal moves of that position."""
+        move = self.board.pop()
+        (self.piece_type_total, self.capture_made, self.terminated, self.result, self.position_key,
+         self._legal_moves, self._legal_move_set, self._legal_moves_uci, self._legal_action_ids) = self._state_stack.pop()
+        return move
+
+    def snapshot(self) -> int:
+        """Current depth of the move stack, restore() returns to it."""
+        return len(self._state_stack)
+
+    def restore(self, snapshot:int):
+        """Pop moves back to a snapshot() of this game."""
+        while len(self._state_stack) > snapshot:
+            self.pop()
+
+    def _playout_move(self, policy:str, book, rng) -> Move:
+        """Next move of a playout: weighted by the opening book's play counts for known positions with 'book', otherwise random."""
+        legal_moves = self.legal_moves()
+        if policy == 'book':
+            book_moves = book.moves(self.position_key)
+            if (book_moves is not None) and (book_moves[1].sum() > 0):
+                move = ACTION_MOVES[int(rng.choices(book_moves[0], weights=book_moves[1])[0])]
+                # Position keys are hashes, a key collision could give a move that is not legal here
+                if move in self.legal_move_set():
+                    return move
+        return rng.choice(legal_moves)
+
+    def playout(self, policy:str = 'random', sub_goal:list = None, max_plies:int = PLAYOUT_MAX_PLIES,
+                book = None, rng:random.Random = None) -> Dict[str, any]:
+        """Play one game from the current position to the sub-goal, the game end or max_plies, then restore the position.
+        policy 'random' or 'book' (opening book guided, defaults to the shared book of SampledAgent).
+        Returns the plies played, whether the sub-goal was reached and by which side, and the game result.
+        sub_goal defaults to ['first_capture'], [] plays to the game end or max_plies."""
+        sub_goal = sub_goal if sub_goal is not None else ['first_capture']
+        if (policy == 'book') and (book is None):
+            from environment.opponent_agents.opening_book import load_book
+            book = load_book()
+        rng = rng if rng is not None else random
+        snapshot = self.snapshot()
+        plies = 0
+        goal = bool(sub_goal) and self.sub_goal_reached(sub_goal)
+        while (not goal) and (not self.terminated) and (plies < max_plies):
+            self._push(self._playout_move(policy, book, rng))
+            plies += 1
+            goal = bool(sub_goal) and self.sub_goal_reached(sub_goal)
+        # The sub-goal is reached by the side that made the last move
+        goal_by = ('white' if self.board.turn == chess.BLACK else 'black') if goal else None
+        outcome = {'plies': plies, 'goal': goal, 'goal_by': goal_by, 'terminated': self.terminated, 'result': self.result}
+        self.restore(snapshot)
+        return outcome
+
+    def playouts(self, k:int, policy:str = 'random', sub_goal:list = None, max_plies:int = PLAYOUT_MAX_PLIES,
+                 book = None, rng:random.Random = None) -> Dict[str, any]:
+        """Run k playouts from the current position, returns their outcome statistics:
+        goal/white_goal/black_goal/terminated rates, mean plies and counts of each game result."""
+        sub_goal = sub_goal if sub_goal is not None else ['first_capture']
+        if (policy == 'book') and (book is None):
+            from environment.opponent_agents.opening_book import load_book
+            book = load_book()
+        outcomes = [self.playout(policy, sub_goal, max_plies, book, rng) for _ in range(k)]
+        results: Dict[str, int] = {}
+        for outcome in outcomes:
+            results[outcome['result']] = results.get(outcome['result'], 0) + 1
+        k = max(k, 1)
+        return {'playouts': len(outcomes),
+                'goal_rate': sum([outcome['goal'] for outcome in outcomes])/k,
+                'white_goal_rate': sum([outcome['goal_by'] == 'white' for outcome in outcomes])/k,
+                'black_goal_rate': sum([outcome['goal_by'] == 'black' for outcome in outcomes])/k,
+                'terminated_rate': sum([outcome['terminated'] for outcome in outcomes])/k,
+                'mean_plies': sum([outcome['plies'] for outcome in outcomes])/k,
+                'results': results}
 
+    def move_playouts(self, k:int, policy:str = 'random', sub_goal:list = None, max_plies:int = PLAYOUT_MAX_PLIES,
+                      book = None, rng:random.Random = None) -> Dict[str, Dict[str, any]]:
+        """playouts() after each legal move of the current position, keyed by uci, e.g. for a lookahead opponent.
+        The move itself counts as the first ply."""
+        sub_goal = sub_goal if sub_goal is not None else ['first_capture']
+        stats = {}
+        for move in self.legal_moves():
+            self._push(move)
+            stats[move.uci()] = self.playouts(k, policy, sub_goal, max(max_plies-1, 0), book, rng)
+            self.pop()
+        return stats
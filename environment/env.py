@@ -1,7 +1,12 @@
 from tqdm import tqdm
 import time
+import random
 # ------ Imports -----------------------------------------
 from environment.engine import Engine
+from environment.observed_state_buffer import ObservedStateBuffer
+from environment.results_writer import EpisodeResultsWriter, new_results_dir
+from environment.phase_timer import PhaseTimer
+from environment.selfplay_corpus import SelfPlayCorpus, load_corpus
 # Agent Setup
 from helios_rl.environment_setup.imports import ImportHelper
 # Evaluation standards
@@ -9,6 +14,7 @@ from helios_rl.environment_setup.results_table import ResultsTable
 from helios_rl.environment_setup.helios_info import HeliosInfo
 # ------ Chess specific imports --------------------------
 import numpy as np
+import pandas as pd
 import chess
 # ------ Opponent Agents -----------------------------------------
 # Chess uniquely requires an opponent player for the probabilistic environment
@@ -32,6 +38,11 @@ from adapters.poss_actions_to_language_adapter import PossibleActionsToLanguageA
 from adapters.prior_actions_to_language_adapter import PriorActionsToLanguageAdapter
 from adapters.combined_adapter import CombinedAdapter
 from adapters.human_language_annotations import HumanAnnotationsAdapter
+from adapters.adapter_abstract import ACTION_UCI, AdaptedState
+# Sentence embedding cache shared by the language adapters
+from adapters import encoder_cache
+from adapters import sentence_interner
+from adapters import encoder_registry
 
 STATE_ADAPTER_TYPES = {
     "Engine": BoardAdapter,
@@ -52,6 +63,12 @@ class Environment:
         self.start_obs = self.env.reset()
         # ---
         # --- PRESET HELIOS INFO
+        # Embedding cache settings must be set before the adapter is built
+        # - e.g. "embedding_cache": {"max_size": 50000, "store_path": "./output/embedding_cache"}
+        encoder_cache.configure(**local_setup_info.get('embedding_cache', {}))
+        # Sentence ids of indexed adapter modes, shared across processes if a path is set
+        # - e.g. "sentence_interner": {"path": "./output/sentence_interner", "capacity": 1048576}
+        sentence_interner.configure(**local_setup_info.get('sentence_interner', {}))
         # Agent
         Imports = ImportHelper(local_setup_info)
         self.agent, self.agent_type, self.agent_name, self.agent_state_adapter = Imports.agent_info(STATE_ADAPTER_TYPES)
@@ -62,9 +79,28 @@ class Environment:
         self.live_env, self.observed_states, self.experience_sampling = Imports.live_env_flag()
         # Results formatting
         self.results = ResultsTable(local_setup_info)
+        # Optional columnar results sink with packed move histories, written in chunks during the run
+        # - e.g. "results_sink": {"dir": "./output/results_sink", "chunk_size": 10000, "csv_action_history": false}
+        # - csv_action_history false stops action histories being kept in the ResultsTable/results.csv as well
+        self.results_sink: dict = local_setup_info.get('results_sink', {}) or {}
+        self.results_writer: EpisodeResultsWriter = None
+        # Training replays a self-play corpus instead of playing live games if set (python -m environment.selfplay_corpus)
+        # - e.g. "replay_corpus": "./output/selfplay_corpus", testing is always played live
+        self.replay_corpus_dir: str = local_setup_info.get('replay_corpus', None)
+        # Tabular agents (e.g. Qlearntab) can be given each state's 64-bit integer key instead of its encoded Tensor
+        # - "state_keys": true, see StateAdapter.key()
+        self.state_keys: bool = bool(local_setup_info.get('state_keys', False))
+        # Per-phase timers of the episode loop, "phase_timers": true in config_local.json
+        # - per-episode phase totals are added to the results sink, p50/p99 summary printed at the end of the run
+        self.phase_timer = PhaseTimer(local_setup_info.get('phase_timers', False), max(1, int(local_setup_info.get('vector_envs', 1))))
+        # Per-episode phase totals in ResultsTable row order, added to results.csv as time_<phase> columns
+        self.episode_phase_times: list = []
         # HELIOS input function
         # - We only want to init trackers on first batch otherwise it resets knowledge
         self.helios = HeliosInfo(self.observed_states, self.experience_sampling)
+        # Observed states are buffered locally and passed to HELIOS in bulk
+        # - "observed_state_flush_interval": number of episodes between flushes (default 1, end of every episode)
+        self.observed_state_buffer = ObservedStateBuffer(self.helios, local_setup_info.get('observed_state_flush_interval', 1))
         # Env start position for instr input
         # Enable sub-goals
         if (local_setup_info['sub_goal'] is not None) & (local_setup_info['sub_goal']!=["None"]) & (local_setup_info['sub_goal']!="None"):
@@ -113,8 +149,13 @@ class Environment:
     @staticmethod
     def reward(reward_signal, current_board_fen, player_turn, action_num, action_cap, game_over) -> float:
         current_board = chess.Board(current_board_fen)
+        game_result = current_board.result() if game_over is True else '*'
+        return Environment.reward_from_result(reward_signal, game_result, player_turn, action_num, action_cap, game_over)
+
+    @staticmethod
+    def reward_from_result(reward_signal, game_result, player_turn, action_num, action_cap, game_over) -> float:
+        """Reward from a game result string (e.g. Engine.result) so the board is not re-parsed."""
         if game_over is True:
-            game_result = current_board.result() # If game not ended == '*'
             # Action limit reached so draw (stalemate)
             if (game_result == '*')&(action_num == action_cap):
                 r = reward_signal[1]
@@ -140,7 +181,15 @@ class Environment:
             r = reward_signal[2]     
         return r
 
-    def episode_loop(self):
+    @staticmethod
+    def opponent_policy(agent, obs, legal_moves, position_key):
+        """Opponent move, the sampled opponent looks positions up by the engine's position key."""
+        if isinstance(agent, SampledAgent):
+            return agent.policy(obs, legal_moves, position_key=position_key)
+        return agent.policy(obs, legal_moves)
+
+    def episode_settings(self):
+        """Opponent, opponent name, number of episodes and action cap for the current phase."""
         # Mode selection (already initialized)
         if self.train:
             BLACK_AGENT = self.training_opponent
@@ -152,43 +201,120 @@ class Environment:
             black_player_name = self.training_opponent_name
             number_episodes = self.num_test_episodes
             action_cap = self.testing_action_cap
+        return BLACK_AGENT, black_player_name, number_episodes, action_cap
+
+    def open_results_writer(self, black_player_name: str):
+        """Start a new results sink directory for this phase if one is configured."""
+        if self.results_sink.get('dir', None) is None:
+            self.results_writer = None
+            return
+        phase = 'training' if self.train else 'testing'
+        results_dir = new_results_dir(self.results_sink['dir'], str(self.agent_name) + '_' + phase + '_results')
+        self.results_writer = EpisodeResultsWriter(results_dir, str(self.agent_name), str(black_player_name),
+                                                   self.results_sink.get('chunk_size', 10000))
+
+    def log_episode(self, black_player_name: str, episode: int, action: int, episode_reward: float, episode_time: float,
+                    action_history: list, q_total, q_mean, phase_times: dict = None):
+        """Add an episode to the ResultsTable and the results sink."""
+        if self.results_writer is not None:
+            self.results_writer.add(episode, action, episode_reward, episode_time, action_history, q_total, q_mean, phase_times)
+            if not self.results_sink.get('csv_action_history', True):
+                action_history = []
+        self.results.results_per_episode(self.agent_name, black_player_name, episode, action, episode_reward, episode_time, action_history, q_total, q_mean)
+        if self.phase_timer.enabled:
+            self.episode_phase_times.append(phase_times if phase_times is not None else {})
+
+    def results_table(self):
+        """ResultsTable output, with the per-episode phase totals as time_<phase> columns when phase timers are on."""
+        table = self.results.results_table_format()
+        if len(self.episode_phase_times) > 0:
+            if isinstance(table, pd.DataFrame) and (len(table) == len(self.episode_phase_times)):
+                table = pd.concat([table, pd.DataFrame(self.episode_phase_times, index=table.index)], axis=1)
+            else:
+                print("Phase timer columns not added, results table rows do not match the logged episodes")
+        return table
+
+    def close_results_writer(self):
+        if self.results_writer is not None:
+            self.results_writer.close()
+            print("Results written to", self.results_writer.results_dir, "|", self.results_writer.num_chunks, "chunks")
+            self.results_writer = None
+
+    def agent_state(self, adapted: AdaptedState):
+        """State given to the agent, the state key if state keys are enabled otherwise the encoded state."""
+        return adapted.key if self.state_keys else adapted.encoded
+
+    def replay_enabled(self) -> bool:
+        return bool(self.train and self.live_env and (self.replay_corpus_dir is not None))
+
+    def episode_loop(self):
+        if self.replay_enabled():
+            return self.replay_episode_loop()
+        BLACK_AGENT, black_player_name, number_episodes, action_cap = self.episode_settings()
+        self.open_results_writer(black_player_name)
+        timer = self.phase_timer
 
         for episode in tqdm(range(0, number_episodes)):
             action_history = []
             # ---
             # Start observation is used instead of .reset() fn so that this can be overriden for repeat analysis from the same start pos
             obs = self.env.reset() # In this case we can hard reset the env because chess has a fixed start
+            t = timer.start()
             legal_moves = self.env.legal_move_generator(obs)
-            state = self.agent_state_adapter.adapter(board_fen=obs, legal_moves=legal_moves, episode_action_history=action_history, encode=True)
+            timer.stop('legal_moves', t)
+            t = timer.start()
+            adapted = self.agent_state_adapter.adapt(board_fen=obs, legal_moves=legal_moves, episode_action_history=action_history,
+                                                     position_key=self.env.position_key)
+            timer.stop('adapter_language', t)
+            t = timer.start()
+            state = self.agent_state(adapted)
+            timer.stop('encoder', t)
             # ---
             start_time = time.time()
             episode_reward:int = 0
             for action in range(0,self.training_action_cap):
                 if self.live_env:
                     # Agent takes action
+                    t = timer.start()
                     legal_moves = self.env.legal_move_generator(obs)
+                    timer.stop('legal_moves', t)
+                    t = timer.start()
                     agent_action = self.agent.policy(state, legal_moves)
+                    timer.stop('agent_policy', t)
                     action_history.append(agent_action)
                     # Push move into board engine
+                    t = timer.start()
                     next_obs, reward, engine_terminated = self.env.step(state=obs, action=agent_action)
+                    timer.stop('engine_step', t)
+                    t = timer.start()
                     legal_moves = self.env.legal_move_generator(next_obs) 
-                    next_state = self.agent_state_adapter.adapter(board_fen=next_obs, legal_moves=legal_moves, episode_action_history=action_history, encode=True)
+                    timer.stop('legal_moves', t)
+                    # Adapted once per position, the language and encoded forms are both reused below
+                    t = timer.start()
+                    next_adapted = self.agent_state_adapter.adapt(board_fen=next_obs, legal_moves=legal_moves, episode_action_history=action_history,
+                                                                  position_key=self.env.position_key)
+                    timer.stop('adapter_language', t)
+                    t = timer.start()
+                    next_state = self.agent_state(next_adapted)
+                    timer.stop('encoder', t)
                     # ---
                     # Game over check
-                    terminated = Environment.goal_reached(current_board_fen=next_obs, 
-                                        sub_goal_board=self.sub_goal, 
-                                        engine_terminated=engine_terminated, 
-                                        action_num=action, action_cap=action_cap)
+                    # - read from the engine's running game state rather than re-parsing next_obs
+                    t = timer.start()
+                    terminated = self.env.goal_reached(sub_goal=self.sub_goal, action_num=action, action_cap=action_cap)
                     # Reward signal function
-                    reward = Environment.reward(self.reward_signal, next_obs, 'white', action, action_cap, terminated)
+                    reward = Environment.reward_from_result(self.reward_signal, self.env.result, 'white', action, action_cap, terminated)
+                    timer.stop('goal_reward', t)
                     # ---
                     
                     # HELIOS trackers    
-                    self.helios.observed_state_tracker(engine_observation=next_obs,
-                                                        language_state=self.agent_state_adapter.adapter(board_fen=next_obs, legal_moves=legal_moves, episode_action_history=action_history, encode=False))
+                    t = timer.start()
+                    self.observed_state_buffer.track(engine_observation=next_obs,
+                                                     language_state=next_adapted.language)
                     
                     # MUST COME BEFORE SUB-GOAL CHECK OR 'TERMINAL STATES' WILL BE FALSE
                     self.helios.experience_sampling_add(state, agent_action, next_state, reward, terminated)
+                    timer.stop('helios_tracking', t)
                     # CHESS: NOT NEEDED HERE BECAUSE ITS PERFORMED IN GOAL_REACHED CHECK
                     # # Trigger end on sub-goal if defined
                     # if self.sub_goal:
@@ -209,11 +335,15 @@ class Environment:
                     if legal_moves == None:
                         break
                     
+                    t = timer.start()
                     agent_action = self.agent.policy(state, legal_moves)
+                    timer.stop('agent_policy', t)
                     next_state, reward, terminated = self.helios.experience_sampling_step(state, agent_action)
 
                 if self.train:
+                    t = timer.start()
                     self.agent.learn(state, next_state, reward, agent_action)
+                    timer.stop('agent_learn', t)
                 episode_reward+=reward
                 if terminated:
                     break    
@@ -222,28 +352,41 @@ class Environment:
                 if self.live_env:
                     obs = next_obs
                     #action_num+=1 # Don't increase action count for black players action
+                    t = timer.start()
                     legal_moves = self.env.legal_move_generator(obs)
+                    timer.stop('legal_moves', t)
                     # ------------ ENGINE ACTION ------------
                     # Snapshot previous board/state/move before action gets made by agent for next adapter
-                    black_action = BLACK_AGENT.policy(obs, legal_moves)
+                    t = timer.start()
+                    black_action = self.opponent_policy(BLACK_AGENT, obs, legal_moves, self.env.position_key)
+                    timer.stop('opponent_policy', t)
                     action_history.append(black_action)
                     # Push move into board engine
+                    t = timer.start()
                     next_obs, reward, engine_terminated = self.env.step(state=obs, action=black_action)
+                    timer.stop('engine_step', t)
+                    t = timer.start()
                     legal_moves = self.env.legal_move_generator(obs)
+                    timer.stop('legal_moves', t)
                     # Need to call so that black action gets added to adapter history
-                    black_state = self.agent_state_adapter.adapter(board_fen=next_obs, legal_moves=legal_moves, episode_action_history=action_history, encode=True)
+                    # - the encoded form is not used so is never computed
+                    t = timer.start()
+                    black_state = self.agent_state_adapter.adapt(board_fen=next_obs, legal_moves=legal_moves, episode_action_history=action_history,
+                                                                 position_key=self.env.position_key)
+                    timer.stop('adapter_language', t)
                     # Game over check
-                    terminated = Environment.goal_reached(current_board_fen=next_obs, 
-                                        sub_goal_board=self.sub_goal, 
-                                        engine_terminated=engine_terminated, 
-                                        action_num=action, action_cap=action_cap)
+                    t = timer.start()
+                    terminated = self.env.goal_reached(sub_goal=self.sub_goal, action_num=action, action_cap=action_cap)
+                    timer.stop('goal_reward', t)
                     # End episode
                     if terminated:
                         # Reward signal function
-                        reward = Environment.reward(self.reward_signal, next_obs, 'black', action, action_cap, terminated)
+                        reward = Environment.reward_from_result(self.reward_signal, self.env.result, 'black', action, action_cap, terminated)
                         episode_reward+=reward
                         # In the case the black player ends the game, update white's knowledge with their last move + new reward
+                        t = timer.start()
                         self.agent.learn(state, next_state, reward, agent_action)
+                        timer.stop('agent_learn', t)
                         break
                     else:
                         state=next_state
@@ -253,8 +396,121 @@ class Environment:
                 
             end_time = time.time()
             agent_results = self.agent.q_result()
+            t = timer.start()
+            self.observed_state_buffer.end_episode()
+            timer.stop('helios_tracking', t)
+            phase_times = timer.end_episode()
             if self.live_env:
-                self.results.results_per_episode(self.agent_name, black_player_name, episode, action, episode_reward, (end_time-start_time), action_history, agent_results[0], agent_results[1]) 
+                self.log_episode(black_player_name, episode, action, episode_reward, (end_time-start_time), action_history, agent_results[0], agent_results[1], phase_times)
+
+        self.observed_state_buffer.flush()
+        self.close_results_writer()
+        Environment.print_cache_stats()
+        timer.print_summary()
+        return self.results_table()
+
+    def replay_episode_loop(self):
+        """Off-policy training from a self-play corpus, each episode replays a randomly chosen corpus game.
+           The moves are pushed through the engine and adapted as in a live game, the agent learns from the
+           corpus move in place of its own policy and HELIOS trackers/experience sampling are fed the same way."""
+        corpus: SelfPlayCorpus = load_corpus(self.replay_corpus_dir)
+        BLACK_AGENT, black_player_name, number_episodes, action_cap = self.episode_settings()
+        black_player_name = 'Replay_' + str(corpus.meta.get('opponent', ''))
+        self.open_results_writer(black_player_name)
+        timer = self.phase_timer
 
-        return self.results.results_table_format()
+        for episode in tqdm(range(0, number_episodes)):
+            game = corpus.game(random.randrange(len(corpus)))
+            ply = 0
+            action_history = []
+            obs = self.env.reset()
+            legal_moves = self.env.legal_move_generator(obs)
+            state = self.agent_state(self.agent_state_adapter.adapt(board_fen=obs, legal_moves=legal_moves, episode_action_history=action_history,
+                                                                    position_key=self.env.position_key))
+            start_time = time.time()
+            episode_reward:int = 0
+            terminated = False
+            for action in range(0,self.training_action_cap):
+                # Corpus game ended (e.g. generated with a lower action cap)
+                if ply == len(game):
+                    break
+                # White turn, replayed corpus move
+                agent_action = str(ACTION_UCI[game[ply]])
+                ply += 1
+                action_history.append(agent_action)
+                t = timer.start()
+                next_obs, reward, engine_terminated = self.env.step(state=obs, action=agent_action)
+                timer.stop('engine_step', t)
+                legal_moves = self.env.legal_move_generator(next_obs)
+                t = timer.start()
+                next_adapted = self.agent_state_adapter.adapt(board_fen=next_obs, legal_moves=legal_moves, episode_action_history=action_history,
+                                                              position_key=self.env.position_key)
+                timer.stop('adapter_language', t)
+                t = timer.start()
+                next_state = self.agent_state(next_adapted)
+                timer.stop('encoder', t)
+                t = timer.start()
+                terminated = self.env.goal_reached(sub_goal=self.sub_goal, action_num=action, action_cap=action_cap)
+                reward = Environment.reward_from_result(self.reward_signal, self.env.result, 'white', action, action_cap, terminated)
+                timer.stop('goal_reward', t)
+                t = timer.start()
+                self.observed_state_buffer.track(engine_observation=next_obs, language_state=next_adapted.language)
+                self.helios.experience_sampling_add(state, agent_action, next_state, reward, terminated)
+                timer.stop('helios_tracking', t)
+                t = timer.start()
+                self.agent.learn(state, next_state, reward, agent_action)
+                timer.stop('agent_learn', t)
+                episode_reward+=reward
+                if terminated or (ply == len(game)):
+                    break
+                # Black turn, replayed corpus move
+                obs = next_obs
+                black_action = str(ACTION_UCI[game[ply]])
+                ply += 1
+                action_history.append(black_action)
+                t = timer.start()
+                next_obs, reward, engine_terminated = self.env.step(state=obs, action=black_action)
+                timer.stop('engine_step', t)
+                legal_moves = self.env.legal_move_generator(next_obs)
+                t = timer.start()
+                self.agent_state_adapter.adapt(board_fen=next_obs, legal_moves=legal_moves, episode_action_history=action_history,
+                                               position_key=self.env.position_key)
+                timer.stop('adapter_language', t)
+                t = timer.start()
+                terminated = self.env.goal_reached(sub_goal=self.sub_goal, action_num=action, action_cap=action_cap)
+                timer.stop('goal_reward', t)
+                if terminated:
+                    reward = Environment.reward_from_result(self.reward_signal, self.env.result, 'black', action, action_cap, terminated)
+                    episode_reward+=reward
+                    t = timer.start()
+                    self.agent.learn(state, next_state, reward, agent_action)
+                    timer.stop('agent_learn', t)
+                    break
+                obs = next_obs
+                state = next_state
+
+            end_time = time.time()
+            agent_results = self.agent.q_result()
+            t = timer.start()
+            self.observed_state_buffer.end_episode()
+            timer.stop('helios_tracking', t)
+            self.log_episode(black_player_name, episode, action, episode_reward, (end_time-start_time), action_history,
+                             agent_results[0], agent_results[1], timer.end_episode())
+
+        self.observed_state_buffer.flush()
+        self.close_results_writer()
+        Environment.print_cache_stats()
+        timer.print_summary()
+        return self.results_table()
+
+    @staticmethod
+    def print_cache_stats():
+        """Report the sentence embedding cache hit rate and language encoder load cost for this process."""
+        stats = encoder_cache.cache_stats()
+        if (stats['hits'] + stats['store_hits'] + stats['misses']) > 0:
+            print("Embedding cache hit rate: " + str(round(stats['hit_rate']*100, 2)) + "% (" + str(stats['misses']) + " sentences encoded)")
+        model_stats = encoder_registry.encoder_stats()
+        if model_stats['loaded']:
+            print("Language encoder: 1 shared instance, loaded in " + str(round(model_stats['load_time_s'], 2)) + "s, +"
+                  + str(round(model_stats['rss_increase_mb'], 1)) + "MB RSS")
                     
@@ -0,0 +1,71 @@
+from typing import Dict, List, Tuple
+
+# Local buffer in front of HeliosInfo.observed_state_tracker
+# - FENs and language states are interned to integer ids while they are buffered
+# - each (observation, language state) pair is passed to HELIOS once per flush: repeats within the buffered
+#   episodes are dropped. This assumes the tracker records which pairs were seen rather than how often,
+#   pairs seen again after a flush are passed again so at most one repeat per flush window is dropped.
+# - pairs are flushed in bulk at the end of every 'observed_state_flush_interval' episodes (config_local.json)
+#   and the interned tables are cleared, so memory is bounded by one window (HELIOS keeps its own copy)
+
+
+class ObservedStateBuffer:
+    def __init__(self, helios, flush_interval: int = 1):
+        self.helios = helios
+        self.flush_interval: int = max(1, int(flush_interval))
+        self._clear()
+        self.episodes_since_flush: int = 0
+        self.tracked: int = 0
+        self.passed: int = 0
+
+    def _clear(self):
+        """Empty the interned tables and pending pairs of the current window."""
+        self.observation_ids: Dict[str, int] = {}
+        self.observations: List[str] = []
+        self.language_ids: Dict[any, int] = {}
+        self.language_states: List[any] = []
+        # Pairs waiting to be flushed, in first seen order
+        self.pending: Dict[Tuple[int, int], None] = {}
+
+    def _intern_observation(self, engine_observation: str) -> int:
+        observation_id = self.observation_ids.get(engine_observation, None)
+        if observation_id is None:
+            observation_id = len(self.observations)
+            self.observation_ids[engine_observation] = observation_id
+            self.observations.append(engine_observation)
+        return observation_id
+
+    def _intern_language(self, language_state) -> int:
+        # Language states are lists of sentences (or counts) for most adapters
+        key = tuple(language_state) if isinstance(language_state, list) else language_state
+        language_id = self.language_ids.get(key, None)
+        if language_id is None:
+            language_id = len(self.language_states)
+            self.language_ids[key] = language_id
+            self.language_states.append(language_state)
+        return language_id
+
+    def track(self, engine_observation: str, language_state):
+        """Record an observed state, same arguments as HeliosInfo.observed_state_tracker."""
+        self.tracked += 1
+        pair = (self._intern_observation(engine_observation), self._intern_language(language_state))
+        self.pending[pair] = None
+
+    def end_episode(self):
+        """Flush if the flush interval has been reached."""
+        self.episodes_since_flush += 1
+        if self.episodes_since_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Pass every buffered pair to HELIOS and start a new window."""
+        for observation_id, language_id in self.pending:
+            self.helios.observed_state_tracker(engine_observation=self.observations[observation_id],
+                                               language_state=self.language_states[language_id])
+        self.passed += len(self.pending)
+        self._clear()
+        self.episodes_since_flush = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'tracked': self.tracked, 'passed': self.passed, 'pending': len(self.pending),
+                'observations': len(self.observations), 'language_states': len(self.language_states)}
@@ -0,0 +1,159 @@
+import os
+import json
+import argparse
+from typing import Dict, List, Tuple
+import numpy as np
+
+from adapters.adapter_abstract import ACTION_INDEX, fen_position_key
+
+# Compact opening book used by SampledAgent
+# - keys.npy: sorted uint64 position keys (polyglot Zobrist, see Engine.position_key)
+# - offsets.npy: int64, moves of position i are rows offsets[i]:offsets[i+1]
+# - actions.npy: uint16 action ids (adapters.adapter_abstract.ACTION_UCI)
+# - counts.npy: int64 human play counts
+# - cum_counts.npy: int64 running total of counts over the whole book, used to sample a move by bisection
+# Built offline from move_stats.json + stats_map.json with: python -m environment.opponent_agents.opening_book
+# Loaded read-only through a memory map so every agent and worker process shares one copy.
+BOOK_DIR = './language_info/opening_book'
+MOVE_STATS_PATH = './language_info/move_stats.json'
+STATS_MAP_PATH = './language_info/stats_map.json'
+BOOK_FILES = ['keys', 'offsets', 'actions', 'counts', 'cum_counts']
+# Books built before cum_counts was added are still loaded, it is then computed on load
+REQUIRED_BOOK_FILES = ['keys', 'offsets', 'actions', 'counts']
+# Books are opened once per process, keyed by directory
+_BOOKS: Dict[str, 'OpeningBook'] = {}
+
+
+def merge_player_data(player_data_dict: dict, player_data_counts_dict: dict) -> Dict[str, Dict[str, int]]:
+    """Human play count of each known move, 0 if the position or move has no count data."""
+    # player_data_dict[board_fen][move_uci] = {'prev_moves_uci', 'move_name', 'outcome_board', 'count', 'win_perc'}
+    # player_data_counts_dict[board_fen][move_uci] = {'prev_moves_uci', 'totalGames', ...}
+    move_counts = {}
+    for board_fen, moves in player_data_dict.items():
+        position_counts = player_data_counts_dict.get(board_fen, {})
+        move_counts[board_fen] = {move_uci: (position_counts[move_uci]['totalGames'] if move_uci in position_counts else 0)
+                                  for move_uci in moves}
+    return move_counts
+
+
+class OpeningBook:
+    """Read-only position -> (action ids, counts) lookup over sorted key and packed move arrays."""
+    def __init__(self, keys: np.ndarray, offsets: np.ndarray, actions: np.ndarray, counts: np.ndarray, cum_counts: np.ndarray = None):
+        self.keys = keys
+        self.offsets = offsets
+        self.actions = actions
+        self.counts = counts
+        self.cum_counts = cum_counts if cum_counts is not None else np.cumsum(counts, dtype=np.int64)
+
+    @classmethod
+    def from_move_counts(cls, move_counts: Dict[str, Dict[str, int]]) -> 'OpeningBook':
+        """Pack a {board_fen: {move_uci: count}} dict, move order within a position is kept.
+           FENs of the same position (e.g. only the move counters differ) are merged and their counts added."""
+        position_moves: Dict[int, Dict[str, int]] = {}
+        for board_fen, moves in move_counts.items():
+            merged = position_moves.setdefault(fen_position_key(board_fen), {})
+            for move_uci, count in moves.items():
+                merged[move_uci] = merged.get(move_uci, 0) + count
+        positions = sorted(position_moves.items(), key=lambda p: p[0])
+        keys = np.array([key for key, moves in positions], dtype=np.uint64)
+        offsets = np.zeros(len(positions)+1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(moves) for key, moves in positions])
+        actions = np.array([ACTION_INDEX[move_uci] for key, moves in positions for move_uci in moves], dtype=np.uint16)
+        counts = np.array([count for key, moves in positions for count in moves.values()], dtype=np.int64)
+        return cls(keys, offsets, actions, counts)
+
+    @classmethod
+    def from_json(cls, move_stats_path: str = MOVE_STATS_PATH, stats_map_path: str = STATS_MAP_PATH) -> 'OpeningBook':
+        with open(move_stats_path, 'r') as json_file:
+            player_data_dict = json.load(json_file)
+        with open(stats_map_path, 'r') as json_file:
+            player_data_counts_dict = json.load(json_file)
+        return cls.from_move_counts(merge_player_data(player_data_dict, player_data_counts_dict))
+
+    @classmethod
+    def load(cls, book_dir: str = BOOK_DIR) -> 'OpeningBook':
+        """Open a built book as read-only memory maps, pages are only read when used."""
+        arrays = [np.load(os.path.join(book_dir, name+'.npy'), mmap_mode='r') if os.path.exists(os.path.join(book_dir, name+'.npy')) else None
+                  for name in BOOK_FILES]
+        return cls(*arrays)
+
+    def save(self, book_dir: str = BOOK_DIR):
+        os.makedirs(book_dir, exist_ok=True)
+        for name in BOOK_FILES:
+            np.save(os.path.join(book_dir, name+'.npy'), np.ascontiguousarray(getattr(self, name)))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def find(self, position_key: int) -> int:
+        """Row of a position in the book, -1 if it is not a known position."""
+        return int(self.find_batch([position_key])[0])
+
+    def find_batch(self, position_keys: List[int]) -> np.ndarray:
+        """Rows of several positions in one search, -1 for positions not in the book."""
+        keys = np.array(position_keys, dtype=np.uint64)
+        rows = np.searchsorted(self.keys, keys)
+        found = rows < len(self.keys)
+        found[found] = self.keys[rows[found]] == keys[found]
+        return np.where(found, rows, -1)
+
+    def totals(self, rows: np.ndarray) -> np.ndarray:
+        """Total count over the moves of each row's position, 0 for rows not in the book."""
+        rows = np.asarray(rows)
+        found = rows >= 0
+        starts = self.offsets[rows[found]]
+        ends = self.offsets[rows[found]+1]
+        totals = np.zeros(len(rows), dtype=np.int64)
+        # Positions with no moves have end == start so their total is 0
+        totals[found] = np.where(ends > starts, self.cum_counts[np.maximum(ends-1, 0)] - self._count_before(starts), 0)
+        return totals
+
+    def _count_before(self, starts: np.ndarray) -> np.ndarray:
+        return np.where(starts > 0, self.cum_counts[np.maximum(starts-1, 0)], 0)
+
+    def sample_actions(self, rows: np.ndarray, draws: np.ndarray) -> np.ndarray:
+        """Action ids picked by draws in 1..total of each row's position.
+           The first move whose running count reaches the draw is found by bisecting the cumulative counts,
+           so moves with a count of 0 are never picked."""
+        targets = self._count_before(self.offsets[np.asarray(rows)]) + np.asarray(draws)
+        return self.actions[np.searchsorted(self.cum_counts, targets, side='left')]
+
+    def moves(self, position_key: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(action ids, counts) of a position's known moves, None if it is not a known position."""
+        i = self.find(position_key)
+        if i < 0:
+            return None
+        start, end = self.offsets[i], self.offsets[i+1]
+        return self.actions[start:end], self.counts[start:end]
+
+
+def load_book(book_dir: str = None, move_stats_path: str = None, stats_map_path: str = None) -> OpeningBook:
+    """Shared opening book for this process, paths default to the module settings.
+       Uses the built book in book_dir if it exists, otherwise the book is compiled in memory from the JSON files."""
+    book_dir = book_dir if book_dir is not None else BOOK_DIR
+    move_stats_path = move_stats_path if move_stats_path is not None else MOVE_STATS_PATH
+    stats_map_path = stats_map_path if stats_map_path is not None else STATS_MAP_PATH
+    if book_dir not in _BOOKS:
+        if all([os.path.exists(os.path.join(book_dir, name+'.npy')) for name in REQUIRED_BOOK_FILES]):
+            _BOOKS[book_dir] = OpeningBook.load(book_dir)
+        else:
+            print("Opening book not built in", book_dir, "- compiling from JSON, build it with: python -m environment.opponent_agents.opening_book")
+            _BOOKS[book_dir] = OpeningBook.from_json(move_stats_path, stats_map_path)
+    return _BOOKS[book_dir]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the human play JSON data into the opening book used by SampledAgent.")
+    parser.add_argument('--move_stats', default=MOVE_STATS_PATH)
+    parser.add_argument('--stats_map', default=STATS_MAP_PATH)
+    parser.add_argument('--book_dir', default=BOOK_DIR)
+    args = parser.parse_args()
+
+    book = OpeningBook.from_json(args.move_stats, args.stats_map)
+    book.save(args.book_dir)
+    size = sum([os.path.getsize(os.path.join(args.book_dir, name+'.npy')) for name in BOOK_FILES])
+    print("Opening book saved to", args.book_dir, "|", len(book), "positions,", len(book.actions), "moves,", round(size/1e6, 2), "MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import random
-import json
+import numpy as np
 from typing import List, Iterable, Any, TypeVar, Generic
 from helios_rl.agents.agent_abstract import Agent
+from adapters.adapter_abstract import ACTION_UCI, fen_position_key
+from environment.opponent_agents.opening_book import OpeningBook, load_book
 import torch
 from torch import Tensor
 T = TypeVar("T")
@@ -11,61 +13,46 @@ class SampledAgent(Agent, Generic[T]):
     """This is simply a random decision maker, does not learn."""
     def __init__(self):
         super().__init__()
-        #with open('language_info/stats_map.json', 'r') as json_file:
-        
         # - MERGE: combine human play data for occurrence count
         # dict[req_board][move_uci] = {'prev_moves_uci': move_seq_prev, 'move_name': move_name,
         #                               'outcome_board': outcome_board,'count': human_play_count,
         #                               'win_perc': win_perc} 
-        print("Loading Player Data")
-        with open('./language_info/move_stats.json', 'r') as json_file:
-            self.player_data_dict = json.load(json_file)
         # dict[board_fen][move_uci] = {'prev_moves_uci': move_list_current,'totalGames': branch["data"]["totalGames"]}
-        with open('./language_info/stats_map.json', 'r') as json_file:
-            self.player_data_counts_dict = json.load(json_file)
-        
-        for board_fen in list(self.player_data_dict.keys()):
-            for move_uci in list(self.player_data_dict[board_fen].keys()):
-                if (board_fen in self.player_data_counts_dict):
-                    if (move_uci in self.player_data_counts_dict[board_fen]):
-                        self.player_data_dict[board_fen][move_uci]["count"] = self.player_data_counts_dict[board_fen][move_uci]['totalGames']  
-                    else:
-                        self.player_data_dict[board_fen][move_uci]["count"] = 0
-                else:
-                    self.player_data_dict[board_fen][move_uci]["count"] = 0
-                
-    def policy(self, state:Iterable[Any] = None, legal_actions:List[T] = []) -> T:
-        if state in self.player_data_dict:
-            # Create list of actions/count
-            # - need to do this to get total
-            total = 0
-            action_lst = []
-            count_lst = []
-            for action in self.player_data_dict[state]:
-                count = self.player_data_dict[state][action]['count']
-                total += count
+        # The merged counts are compiled into an opening book that all SampledAgents in the process share,
+        # it is opened on first use so constructing the agent is free
+        self._book: OpeningBook = None
 
-                action_lst.append(action)
-                count_lst.append(count)
+    @property
+    def book(self) -> OpeningBook:
+        if self._book is None:
+            self._book = load_book()
+        return self._book
                 
-            # Sample over count list
-            rng = random.randint(0, total)
-            idx = 0
-            cum_count = 0
-            for count in count_lst:
-                cum_count+=count
-                if cum_count >= rng:
-                    break
-                else:
-                    idx+=1
-            if cum_count>0:
-                action = action_lst[idx]
+    def policy(self, state:Iterable[Any] = None, legal_actions:List[T] = [], position_key:int = None) -> T:
+        return self.policy_batch([state], [legal_actions], None if position_key is None else [position_key])[0]
+
+    def policy_batch(self, states:List[Any], legal_actions_lst:List[List[T]], position_keys:List[int] = None) -> List[T]:
+        """Sample a move for each position, weighted by human play counts for known positions, otherwise random.
+           Gives the same moves as calling policy() for each position in turn.
+           position_keys (Engine.position_key) are used for the book lookup if given, otherwise they are found from the FEN states."""
+        if position_keys is None:
+            position_keys = [fen_position_key(state) for state in states]
+        rows = self.book.find_batch(position_keys)
+        totals = self.book.totals(rows)
+        actions = [None]*len(states)
+        book_positions = []
+        draws = []
+        for n, legal_actions in enumerate(legal_actions_lst):
+            if totals[n] > 0:
+                book_positions.append(n)
+                draws.append(random.randint(1, int(totals[n])))
             else:
-                action = str(random.choice(legal_actions))
-        else:
-            action = str(random.choice(legal_actions))
-        
-        return action
+                actions[n] = str(random.choice(legal_actions))
+        if len(book_positions) > 0:
+            action_ids = self.book.sample_actions(rows[book_positions], np.array(draws, dtype=np.int64))
+            for n, action_id in zip(book_positions, action_ids):
+                actions[n] = str(ACTION_UCI[action_id])
+        return actions
     
     def learn(self, state: Tensor, next_state: Tensor, r_p: float, action_code: str) -> float:
         # Do nothing.
@@ -0,0 +1,89 @@
+import math
+import time
+from typing import Dict, List
+import numpy as np
+
+# Optional per-phase timers for the episode loop, enabled with "phase_timers": true in config_local.json
+# - each phase keeps a call counter, its per-episode total and a log-spaced latency histogram
+#   (PHASE_BINS_PER_DECADE bins per decade) so p50/p99 do not need every call to be stored
+# - batched phases (VectorEnvironment) are timed once per batch call and shared evenly between the boards in it
+# When disabled start()/stop() return straight away so the loop can call them unconditionally.
+PHASES = ['agent_policy', 'opponent_policy', 'engine_step', 'legal_moves', 'adapter_language', 'encoder',
+          'goal_reward', 'helios_tracking', 'agent_learn']
+PHASE_BINS_PER_DECADE = 20
+# Latencies from 100ns to 100s
+PHASE_MIN_LATENCY_S = 1e-7
+PHASE_NUM_BINS = 9*PHASE_BINS_PER_DECADE
+
+
+class PhaseTimer:
+    def __init__(self, enabled: bool = False, num_slots: int = 1):
+        self.enabled: bool = bool(enabled)
+        self.calls: Dict[str, int] = {phase: 0 for phase in PHASES}
+        self.histograms: Dict[str, np.ndarray] = {phase: np.zeros(PHASE_NUM_BINS, dtype=np.int64) for phase in PHASES}
+        # Per-episode phase totals of the episode currently running on each board
+        self.slot_totals: List[Dict[str, float]] = [dict.fromkeys(PHASES, 0.0) for _ in range(num_slots)]
+        self.episode_totals: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+
+    def start(self) -> float:
+        if not self.enabled:
+            return 0.0
+        return time.perf_counter()
+
+    def stop(self, phase: str, start: float, slots: list = None):
+        """Add the time since start to a phase, split between the given board slots (default board 0)."""
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter() - start
+        self.calls[phase] += 1
+        latency_bin = int((math.log10(max(elapsed, PHASE_MIN_LATENCY_S)) - math.log10(PHASE_MIN_LATENCY_S))*PHASE_BINS_PER_DECADE)
+        self.histograms[phase][min(latency_bin, PHASE_NUM_BINS-1)] += 1
+        if slots is None:
+            self.slot_totals[0][phase] += elapsed
+        elif len(slots) > 0:
+            share = elapsed/len(slots)
+            for i in slots:
+                self.slot_totals[i][phase] += share
+
+    def end_episode(self, slot: int = 0) -> Dict[str, float]:
+        """Phase totals (seconds) of the episode that just finished on a board, keyed 'time_<phase>'."""
+        if not self.enabled:
+            return {}
+        totals = self.slot_totals[slot]
+        for phase in PHASES:
+            self.episode_totals[phase].append(totals[phase])
+        self.slot_totals[slot] = dict.fromkeys(PHASES, 0.0)
+        return {'time_' + phase: total for phase, total in totals.items()}
+
+    def latency_percentile(self, phase: str, q: float) -> float:
+        """Per-call latency percentile (seconds) at the upper edge of its histogram bin."""
+        counts = np.cumsum(self.histograms[phase])
+        if counts[-1] == 0:
+            return 0.0
+        latency_bin = int(np.searchsorted(counts, q*counts[-1]))
+        return PHASE_MIN_LATENCY_S*10**((latency_bin+1)/PHASE_BINS_PER_DECADE)
+
+    def summary(self) -> List[Dict[str, float]]:
+        """Per-phase calls, total time, share of the timed total, p50/p99 call latency and p50/p99 per-episode time."""
+        totals = {phase: float(np.sum(self.episode_totals[phase])) for phase in PHASES}
+        timed = sum(totals.values())
+        rows = []
+        for phase in PHASES:
+            if self.calls[phase] == 0:
+                continue
+            episode_totals = self.episode_totals[phase] if len(self.episode_totals[phase]) > 0 else [0.0]
+            rows.append({'phase': phase, 'calls': self.calls[phase], 'total_s': totals[phase],
+                         'share': totals[phase]/timed if timed > 0 else 0.0,
+                         'call_p50_s': self.latency_percentile(phase, 0.5), 'call_p99_s': self.latency_percentile(phase, 0.99),
+                         'episode_p50_s': float(np.percentile(episode_totals, 50)), 'episode_p99_s': float(np.percentile(episode_totals, 99))})
+        return rows
+
+    def print_summary(self):
+        if not self.enabled:
+            return
+        print("{:<17}{:>10}{:>10}{:>8}{:>12}{:>12}{:>14}{:>14}".format(
+            'phase', 'calls', 'total s', 'share', 'call p50', 'call p99', 'episode p50', 'episode p99'))
+        for row in self.summary():
+            print("{:<17}{:>10}{:>10.2f}{:>7.1f}%{:>10.1f}us{:>10.1f}us{:>12.2f}ms{:>12.2f}ms".format(
+                row['phase'], row['calls'], row['total_s'], row['share']*100, row['call_p50_s']*1e6, row['call_p99_s']*1e6,
+                row['episode_p50_s']*1e3, row['episode_p99_s']*1e3))
@@ -0,0 +1,125 @@
+import os
+import glob
+import json
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+from adapters.adapter_abstract import ACTION_INDEX, ACTION_UCI
+
+# Append-only columnar sink for per-episode results
+# - episodes are buffered and written every 'chunk_size' episodes to results_dir/chunk_<n>.npz
+# - move histories are packed as uint16 action ids (adapters.adapter_abstract.ACTION_UCI) with int64 offsets,
+#   episode i of a chunk played actions[offsets[i]:offsets[i+1]]
+# - agent/opponent names are stored once in results_dir/meta.json
+# - extra float columns (e.g. phase timings, see environment.phase_timer) can be added per episode
+# load_results() rebuilds the results.csv columns from the chunks.
+NO_ACTION = np.iinfo(np.uint16).max
+COLUMNS = {'episode': np.int64, 'num_actions': np.int32, 'episode_reward': np.float64,
+           'time_per_episode': np.float64, 'q_total': np.float64, 'q_mean': np.float64}
+
+
+def new_results_dir(base_dir: str, name: str) -> str:
+    """Create the next unused base_dir/name_<n> directory, safe when several processes share base_dir."""
+    run = 1
+    while True:
+        results_dir = os.path.join(base_dir, name + '_' + str(run))
+        try:
+            os.makedirs(results_dir)
+            return results_dir
+        except FileExistsError:
+            run += 1
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class EpisodeResultsWriter:
+    def __init__(self, results_dir: str, agent: str, opponent: str, chunk_size: int = 10000):
+        self.results_dir = results_dir
+        self.chunk_size: int = max(1, int(chunk_size))
+        self.num_chunks: int = 0
+        os.makedirs(results_dir, exist_ok=True)
+        with open(os.path.join(results_dir, 'meta.json'), 'w') as meta_file:
+            json.dump({'agent': agent, 'opponent': opponent}, meta_file)
+        self._reset_chunk()
+
+    def _reset_chunk(self):
+        self.columns = {name: [] for name in COLUMNS}
+        self.extra_columns: Dict[str, List[float]] = {}
+        self.actions: List[np.ndarray] = []
+        self.lengths: List[int] = []
+
+    def add(self, episode: int, num_actions: int, episode_reward: float, time_per_episode: float,
+            action_history: List[str], q_total, q_mean, extra: Dict[str, float] = None):
+        """Add one episode, same values as ResultsTable.results_per_episode plus any extra columns."""
+        for name, value in zip(COLUMNS, [episode, num_actions, episode_reward, time_per_episode, _to_float(q_total), _to_float(q_mean)]):
+            self.columns[name].append(value)
+        if extra is not None:
+            for name, value in extra.items():
+                self.extra_columns.setdefault(name, []).append(value)
+        self.actions.append(np.array([ACTION_INDEX.get(action, NO_ACTION) for action in action_history], dtype=np.uint16))
+        self.lengths.append(len(action_history))
+        if len(self.lengths) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered episodes as the next chunk."""
+        if len(self.lengths) == 0:
+            return
+        offsets = np.zeros(len(self.lengths)+1, dtype=np.int64)
+        offsets[1:] = np.cumsum(self.lengths)
+        arrays = {name: np.array(values, dtype=COLUMNS[name]) for name, values in self.columns.items()}
+        for name, values in self.extra_columns.items():
+            arrays[name] = np.array(values, dtype=np.float64)
+        arrays['actions'] = np.concatenate(self.actions) if len(self.actions) > 0 else np.zeros(0, dtype=np.uint16)
+        arrays['offsets'] = offsets
+        np.savez(os.path.join(self.results_dir, 'chunk_' + str(self.num_chunks) + '.npz'), **arrays)
+        self.num_chunks += 1
+        self._reset_chunk()
+
+    def close(self):
+        self.flush()
+
+
+def _chunk_paths(results_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(results_dir, 'chunk_*.npz')), key=lambda path: int(path.split('_')[-1][:-4]))
+
+
+def load_action_histories(results_dir: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(action ids, offsets) of every episode in the results, without decoding to UCI."""
+    actions = []
+    offsets = [np.zeros(1, dtype=np.int64)]
+    for path in _chunk_paths(results_dir):
+        with np.load(path) as chunk:
+            offsets.append(chunk['offsets'][1:] + offsets[-1][-1])
+            actions.append(chunk['actions'])
+    actions = np.concatenate(actions) if len(actions) > 0 else np.zeros(0, dtype=np.uint16)
+    return actions, np.concatenate(offsets)
+
+
+def load_results(results_dir: str, decode_actions: bool = True) -> pd.DataFrame:
+    """Results in the results.csv layout, action_history is decoded to lists of UCI moves if decode_actions."""
+    with open(os.path.join(results_dir, 'meta.json')) as meta_file:
+        meta = json.load(meta_file)
+    columns = {name: [] for name in COLUMNS}
+    for path in _chunk_paths(results_dir):
+        with np.load(path) as chunk:
+            for name in chunk.files:
+                if name not in ['actions', 'offsets']:
+                    columns.setdefault(name, []).append(chunk[name])
+    df = pd.DataFrame({name: (np.concatenate(values) if len(values) > 0 else np.zeros(0, dtype=COLUMNS.get(name, np.float64)))
+                       for name, values in columns.items()})
+    df.insert(0, 'agent', meta['agent'])
+    df.insert(1, 'opponent', meta['opponent'])
+    df.insert(df.columns.get_loc('episode_reward')+1, 'cumulative_reward', df['episode_reward'].cumsum())
+    if decode_actions:
+        actions, offsets = load_action_histories(results_dir)
+        uci = np.append(ACTION_UCI, '')[np.minimum(actions, len(ACTION_UCI))]
+        df.insert(df.columns.get_loc('time_per_episode')+1, 'action_history',
+                  [uci[offsets[i]:offsets[i+1]].tolist() for i in range(len(df))])
+    return df
@@ -0,0 +1,154 @@
+import os
+import json
+import random
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from adapters.adapter_abstract import ACTION_INDEX, ACTION_UCI
+from environment.worker_init import init_worker
+
+# Self-play corpus of games from the standard start, played by a random white player against an opponent agent
+# until the sub-goal (default first capture), the game end or the action cap
+# - actions.npy: uint16 action ids (adapters.adapter_abstract.ACTION_UCI) of every game, white and black moves in order
+# - offsets.npy: int64, game i is actions[offsets[i]:offsets[i+1]]
+# - meta.json: opponent, sub-goal, action cap, seed and size the corpus was generated with
+# Generated on every core with: python -m environment.selfplay_corpus --games 1000000 --opponent Sampled
+# Games are generated in tasks of 'games_per_task' with seed base_seed + task so the corpus does not depend on
+# the number of workers. Moves are streamed to disk as tasks finish and the corpus is opened through a memory map.
+# Environment.episode_loop replays the corpus for training when "replay_corpus" is set in config_local.json.
+CORPUS_DIR = './output/selfplay_corpus'
+GAMES_PER_TASK = 1000
+# Copy block size when packing the streamed moves into actions.npy
+COPY_BLOCK = 1 << 22
+
+
+class SelfPlayCorpus:
+    """Read-only packed game store."""
+    def __init__(self, actions: np.ndarray, offsets: np.ndarray, meta: dict = None):
+        self.actions = actions
+        self.offsets = offsets
+        self.meta = meta if meta is not None else {}
+
+    @classmethod
+    def load(cls, corpus_dir: str = CORPUS_DIR) -> 'SelfPlayCorpus':
+        with open(os.path.join(corpus_dir, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+        return cls(np.load(os.path.join(corpus_dir, 'actions.npy'), mmap_mode='r'),
+                   np.load(os.path.join(corpus_dir, 'offsets.npy'), mmap_mode='r'), meta)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def game(self, i: int) -> np.ndarray:
+        """Action ids of game i."""
+        return np.asarray(self.actions[self.offsets[i]:self.offsets[i+1]])
+
+    def game_uci(self, i: int) -> List[str]:
+        return [str(ACTION_UCI[action]) for action in self.game(i)]
+
+
+def play_games(task: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Play a task's games in a worker, returns the packed action ids and the game lengths."""
+    import torch
+    from environment.engine import Engine
+    from environment.env import Environment, OPPONENT_AGENT_TYPES, OPPONENT_AGENT_PARAMETERS
+    seed = task['seed']
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+    engine = Engine()
+    opponent = OPPONENT_AGENT_TYPES[task['opponent']](**OPPONENT_AGENT_PARAMETERS[task['opponent']])
+    actions = []
+    lengths = []
+    for _ in range(task['games']):
+        obs = engine.reset()
+        game_start = len(actions)
+        for action in range(0, task['action_cap']):
+            # White: uniform random behaviour policy
+            legal_moves = engine.legal_move_generator()
+            white_action = random.choice(legal_moves)
+            actions.append(ACTION_INDEX[white_action])
+            obs, reward, terminated = engine.step(state=obs, action=white_action)
+            if engine.goal_reached(sub_goal=task['sub_goal'], action_num=action, action_cap=task['action_cap']):
+                break
+            # Black: opponent agent
+            black_action = Environment.opponent_policy(opponent, obs, engine.legal_move_generator(), engine.position_key)
+            actions.append(ACTION_INDEX[black_action])
+            obs, reward, terminated = engine.step(state=obs, action=black_action)
+            if engine.goal_reached(sub_goal=task['sub_goal'], action_num=action, action_cap=task['action_cap']):
+                break
+        lengths.append(len(actions) - game_start)
+    return np.array(actions, dtype=np.uint16), np.array(lengths, dtype=np.int64)
+
+
+def generate_corpus(num_games: int, opponent: str = 'Random', sub_goal: list = None, action_cap: int = 20,
+                    corpus_dir: str = CORPUS_DIR, number_workers: int = None, base_seed: int = 0,
+                    games_per_task: int = GAMES_PER_TASK) -> SelfPlayCorpus:
+    """Generate the corpus across a process pool and save it to corpus_dir."""
+    tasks = []
+    for n, start in enumerate(range(0, num_games, games_per_task)):
+        tasks.append({'games': min(games_per_task, num_games - start), 'opponent': opponent, 'sub_goal': sub_goal,
+                      'action_cap': action_cap, 'seed': base_seed + n})
+    number_workers = min(number_workers or os.cpu_count() or 1, max(1, len(tasks)))
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    stream_path = os.path.join(corpus_dir, 'actions.bin')
+    lengths = []
+    # Task results are streamed to disk in task order rather than kept until every game is played
+    with open(stream_path, 'wb') as stream, \
+         ProcessPoolExecutor(max_workers=number_workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=init_worker, initargs=(1,)) as pool:
+        for task_actions, task_lengths in pool.map(play_games, tasks):
+            stream.write(task_actions.tobytes())
+            lengths.append(task_lengths)
+
+    lengths = np.concatenate(lengths) if len(lengths) > 0 else np.zeros(0, dtype=np.int64)
+    offsets = np.zeros(len(lengths)+1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    streamed = np.memmap(stream_path, dtype=np.uint16, mode='r') if offsets[-1] > 0 else np.zeros(0, dtype=np.uint16)
+    actions = open_memmap(os.path.join(corpus_dir, 'actions.npy'), mode='w+', dtype=np.uint16, shape=(int(offsets[-1]),))
+    for start in range(0, len(actions), COPY_BLOCK):
+        actions[start:start+COPY_BLOCK] = streamed[start:start+COPY_BLOCK]
+    actions.flush()
+    del actions, streamed
+    os.remove(stream_path)
+    np.save(os.path.join(corpus_dir, 'offsets.npy'), offsets)
+    meta = {'games': int(len(lengths)), 'plies': int(offsets[-1]), 'opponent': opponent, 'sub_goal': sub_goal,
+            'action_cap': action_cap, 'base_seed': base_seed, 'games_per_task': games_per_task}
+    with open(os.path.join(corpus_dir, 'meta.json'), 'w') as meta_file:
+        json.dump(meta, meta_file)
+    return SelfPlayCorpus.load(corpus_dir)
+
+
+def load_corpus(corpus_dir: str = None) -> SelfPlayCorpus:
+    return SelfPlayCorpus.load(corpus_dir if corpus_dir is not None else CORPUS_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a self-play corpus for replay training.")
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--opponent', default='Random', help="opponent agent, e.g. Random or Sampled")
+    parser.add_argument('--sub_goal', default='first_capture', help="comma separated sub-goals, 'None' to play to the action cap")
+    parser.add_argument('--action_cap', type=int, default=None, help="default training_action_cap in config_local.json")
+    parser.add_argument('--corpus_dir', default=CORPUS_DIR)
+    parser.add_argument('--workers', type=int, default=None, help="default all cores")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--games_per_task', type=int, default=GAMES_PER_TASK)
+    args = parser.parse_args()
+
+    action_cap = args.action_cap
+    if action_cap is None:
+        with open('./config_local.json') as config_file:
+            action_cap = json.load(config_file)['training_action_cap']
+    sub_goal = None if args.sub_goal == 'None' else args.sub_goal.split(',')
+    corpus = generate_corpus(args.games, args.opponent, sub_goal, action_cap, args.corpus_dir, args.workers, args.seed, args.games_per_task)
+    print("Self-play corpus saved to", args.corpus_dir, "|", len(corpus), "games,", len(corpus.actions), "plies")
+
+
+if __name__ == "__main__":
+    main()
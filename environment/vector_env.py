@@ -0,0 +1,245 @@
+from tqdm import tqdm
+import time
+# ------ Imports -----------------------------------------
+from environment.engine import Engine
+from environment.env import Environment
+from environment.observed_state_buffer import ObservedStateBuffer
+from environment.opponent_agents.sampled_agent import SampledAgent
+from adapters.encoder_cache import CachedLanguageEncoder
+from adapters.encoder_registry import LanguageEncoder, SharedLanguageEncoder
+
+
+class VectorEnvironment(Environment):
+    """Steps N independent games in lockstep so adapter encoding and agent policy calls are batched.
+       - Set 'vector_envs' in config_local.json to the number of boards.
+       - Finished games are reset automatically until the episode budget is used up.
+       - Each finished game writes the same per-episode row to ResultsTable as Environment.episode_loop,
+         in episode order. Time per episode is wall time for the board so includes the other boards' steps.
+       - Phase timers of batched calls are shared evenly between the boards in the batch.
+    """
+    def __init__(self, local_setup_info: dict):
+        super().__init__(local_setup_info)
+        self.num_envs: int = max(1, int(local_setup_info.get('vector_envs', 1)))
+        self.envs = [self.env] + [Engine() for _ in range(self.num_envs-1)]
+        # Language adapters track per-game history so every board needs its own instance
+        adapter_type = type(self.agent_state_adapter)
+        self.state_adapters = [self.agent_state_adapter] + [adapter_type() for _ in range(self.num_envs-1)]
+        # Observed states are buffered per board so each flush window covers whole games of that board only
+        flush_interval = self.observed_state_buffer.flush_interval
+        self.observed_state_buffers = [self.observed_state_buffer] + [ObservedStateBuffer(self.helios, flush_interval)
+                                                                      for _ in range(self.num_envs-1)]
+        # Only sentence encoders can be batched by concatenating inputs, other encoders are called per board
+        encoder = getattr(self.agent_state_adapter, 'encoder', None)
+        self.batch_encoder = encoder if isinstance(encoder, (LanguageEncoder, SharedLanguageEncoder, CachedLanguageEncoder)) else None
+
+    def encode_batch(self, languages: list) -> list:
+        """Encode the language states of all boards with a single encoder call."""
+        sentences = []
+        spans = []
+        for language in languages:
+            single = isinstance(language, str)
+            sents = [language] if single else list(language)
+            spans.append((len(sentences), len(sents), single))
+            sentences.extend(sents)
+        encoded = self.batch_encoder.encode(state=sentences)
+        return [encoded[start] if single else encoded[start:start+n] for start, n, single in spans]
+
+    def adapt_batch(self, slots: list, encode: bool = True):
+        """Returns (encoded states, language states) for the given board slots."""
+        t = self.phase_timer.start()
+        adapted = [self.state_adapters[i].adapt(board_fen=self.obs[i], legal_moves=self.envs[i].legal_move_generator(),
+                                                episode_action_history=self.action_history[i], position_key=self.envs[i].position_key)
+                   for i in slots]
+        languages = [adapted_state.language for adapted_state in adapted]
+        self.phase_timer.stop('adapter_language', t, slots)
+        if not encode:
+            return None, languages
+        t = self.phase_timer.start()
+        encoded = self.encode_adapted(adapted, languages)
+        self.phase_timer.stop('encoder', t, slots)
+        return encoded, languages
+
+    def encode_adapted(self, adapted: list, languages: list) -> list:
+        """Agent states of adapted boards, encodings are batched where the adapter or encoder allows it."""
+        if self.state_keys:
+            return [adapted_state.key for adapted_state in adapted]
+        # Adapters that encode from their own per-game state (e.g. the prior actions ring buffer) are encoded
+        # by each board's adapter so its state advances with the game
+        if getattr(self.agent_state_adapter, 'incremental_encode', False):
+            return [adapted_state.encoded for adapted_state in adapted]
+        # Adapters with their own batched encoding (e.g. possible actions) only encode new sentences
+        if hasattr(self.agent_state_adapter, 'encode_batch'):
+            return self.agent_state_adapter.encode_batch(languages)
+        if self.batch_encoder is None:
+            return [adapted_state.encoded for adapted_state in adapted]
+        # States with a prebuilt encoding (e.g. annotated positions) are not sent to the encoder
+        to_encode = [n for n, adapted_state in enumerate(adapted) if not adapted_state.ready]
+        encoded = [adapted_state.encoded if adapted_state.ready else None for adapted_state in adapted]
+        if len(to_encode) > 0:
+            for n, state_encoded in zip(to_encode, self.encode_batch([languages[n] for n in to_encode])):
+                encoded[n] = state_encoded
+        return encoded
+
+    def policy_batch(self, agent, slots: list, states: list) -> list:
+        """Agent actions for the given slots, batched if the agent supports it."""
+        legal_moves = [self.envs[i].legal_move_generator() for i in slots]
+        if isinstance(agent, SampledAgent):
+            return agent.policy_batch(states, legal_moves, [self.envs[i].position_key for i in slots])
+        if hasattr(agent, 'policy_batch'):
+            return list(agent.policy_batch(states, legal_moves))
+        return [agent.policy(state, legal) for state, legal in zip(states, legal_moves)]
+
+    def reset_slot(self, i: int, episode: int):
+        """Start a new game on board i."""
+        self.obs[i] = self.envs[i].reset()
+        self.action_history[i] = []
+        timer = self.phase_timer
+        t = timer.start()
+        legal_moves = self.envs[i].legal_move_generator()
+        timer.stop('legal_moves', t, [i])
+        # Start states have no action history, adapters pad these differently so they are encoded individually
+        t = timer.start()
+        adapted = self.state_adapters[i].adapt(board_fen=self.obs[i], legal_moves=legal_moves,
+                                               episode_action_history=self.action_history[i],
+                                               position_key=self.envs[i].position_key)
+        timer.stop('adapter_language', t, [i])
+        t = timer.start()
+        self.states[i] = self.agent_state(adapted)
+        timer.stop('encoder', t, [i])
+        self.episode_ids[i] = episode
+        self.episode_rewards[i] = 0
+        self.action_nums[i] = 0
+        self.start_times[i] = time.time()
+
+    def episode_loop(self):
+        # Experience sampling replays single states from HELIOS and corpus replay follows stored games so are not batched
+        if (not self.live_env) | (self.num_envs == 1) | self.replay_enabled():
+            return super().episode_loop()
+
+        BLACK_AGENT, black_player_name, number_episodes, action_cap = self.episode_settings()
+        self.open_results_writer(black_player_name)
+        timer = self.phase_timer
+
+        self.obs = [None]*self.num_envs
+        self.states = [None]*self.num_envs
+        self.action_history = [None]*self.num_envs
+        self.episode_ids = [None]*self.num_envs
+        self.episode_rewards = [0]*self.num_envs
+        self.action_nums = [0]*self.num_envs
+        self.start_times = [0]*self.num_envs
+
+        next_episode = 0
+        next_logged = 0
+        completed = {}
+        live = []
+        for i in range(0, min(self.num_envs, number_episodes)):
+            self.reset_slot(i, next_episode)
+            next_episode += 1
+            live.append(i)
+
+        progress = tqdm(total=number_episodes)
+        while len(live) > 0:
+            finished = []
+            # ---------------------------
+            # White turn (agent) for every live board
+            t = timer.start()
+            agent_actions = self.policy_batch(self.agent, live, [self.states[i] for i in live])
+            timer.stop('agent_policy', t, live)
+            for i, agent_action in zip(live, agent_actions):
+                self.action_history[i].append(agent_action)
+                t = timer.start()
+                self.obs[i], reward, engine_terminated = self.envs[i].step(state=self.obs[i], action=agent_action)
+                timer.stop('engine_step', t, [i])
+            next_states, languages = self.adapt_batch(live)
+
+            black_turn = []
+            agent_info = {}
+            for n, i in enumerate(live):
+                agent_action = agent_actions[n]
+                next_state = next_states[n]
+                action = self.action_nums[i]
+                # Game over check
+                t = timer.start()
+                terminated = self.envs[i].goal_reached(sub_goal=self.sub_goal, action_num=action, action_cap=action_cap)
+                # Reward signal function
+                reward = Environment.reward_from_result(self.reward_signal, self.envs[i].result, 'white', action, action_cap, terminated)
+                timer.stop('goal_reward', t, [i])
+                # HELIOS trackers
+                t = timer.start()
+                self.observed_state_buffers[i].track(engine_observation=self.obs[i], language_state=languages[n])
+                self.helios.experience_sampling_add(self.states[i], agent_action, next_state, reward, terminated)
+                timer.stop('helios_tracking', t, [i])
+                if self.train:
+                    t = timer.start()
+                    self.agent.learn(self.states[i], next_state, reward, agent_action)
+                    timer.stop('agent_learn', t, [i])
+                self.episode_rewards[i] += reward
+                if terminated:
+                    finished.append(i)
+                else:
+                    agent_info[i] = (agent_action, next_state)
+                    black_turn.append(i)
+
+            # ---------------------------
+            # Then Black turn (opponent)
+            t = timer.start()
+            black_actions = self.policy_batch(BLACK_AGENT, black_turn, [self.obs[i] for i in black_turn])
+            timer.stop('opponent_policy', t, black_turn)
+            for i, black_action in zip(black_turn, black_actions):
+                self.action_history[i].append(black_action)
+                t = timer.start()
+                self.obs[i], reward, engine_terminated = self.envs[i].step(state=self.obs[i], action=black_action)
+                timer.stop('engine_step', t, [i])
+            # Need to call so that black action gets added to adapter history, the encoded form is not used
+            self.adapt_batch(black_turn, encode=False)
+            for i in black_turn:
+                agent_action, next_state = agent_info[i]
+                action = self.action_nums[i]
+                t = timer.start()
+                terminated = self.envs[i].goal_reached(sub_goal=self.sub_goal, action_num=action, action_cap=action_cap)
+                timer.stop('goal_reward', t, [i])
+                if terminated:
+                    reward = Environment.reward_from_result(self.reward_signal, self.envs[i].result, 'black', action, action_cap, terminated)
+                    self.episode_rewards[i] += reward
+                    # In the case the black player ends the game, update white's knowledge with their last move + new reward
+                    t = timer.start()
+                    self.agent.learn(self.states[i], next_state, reward, agent_action)
+                    timer.stop('agent_learn', t, [i])
+                    finished.append(i)
+                else:
+                    self.states[i] = next_state
+                    # Action limit reached
+                    if action+1 == self.training_action_cap:
+                        finished.append(i)
+                    else:
+                        self.action_nums[i] = action+1
+
+            # ---------------------------
+            # Log finished games and reset their boards
+            for i in finished:
+                end_time = time.time()
+                agent_results = self.agent.q_result()
+                t = timer.start()
+                self.observed_state_buffers[i].end_episode()
+                timer.stop('helios_tracking', t, [i])
+                completed[self.episode_ids[i]] = (self.action_nums[i], self.episode_rewards[i], (end_time-self.start_times[i]),
+                                                  self.action_history[i], agent_results[0], agent_results[1], timer.end_episode(i))
+                progress.update(1)
+                if next_episode < number_episodes:
+                    self.reset_slot(i, next_episode)
+                    next_episode += 1
+                else:
+                    live.remove(i)
+            # Rows are written in episode order, games can finish out of order across boards
+            while next_logged in completed:
+                episode_results = completed.pop(next_logged)
+                self.log_episode(black_player_name, next_logged, *episode_results)
+                next_logged += 1
+        progress.close()
+        for observed_state_buffer in self.observed_state_buffers:
+            observed_state_buffer.flush()
+        self.close_results_writer()
+
+        Environment.print_cache_stats()
+        timer.print_summary()
+        return self.results_table()
@@ -0,0 +1,11 @@
+import os
+
+# Process pool initialiser shared by parallel_runner and environment.selfplay_corpus
+
+
+def init_worker(threads_per_worker: int):
+    """Cap intra-op threads so workers do not oversubscribe cores."""
+    for var in ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS']:
+        os.environ[var] = str(threads_per_worker)
+    import torch
+    torch.set_num_threads(threads_per_worker)
@@ -13,6 +13,9 @@ from helios_rl.config_local import ConfigSetup
 # ====== LOCAL IMPORTS ==========================================
 # ------ Local Environment --------------------------------------
 from environment.env import Environment
+from environment.vector_env import VectorEnvironment
+# ------ Parallel repeats ----------------------------------------
+from parallel_runner import run_parallel
 # ------ Visual Analysis -----------------------------------------------
 from helios_rl import combined_variance_analysis_graph
 
@@ -22,6 +25,11 @@ def main():
     ExperimentConfig = TestingSetupConfig("./config.json").state_configs
     # Local Parameters
     ProblemConfig = ConfigSetup("./config_local.json").state_configs
+    # Step several boards in lockstep so adapter encoding and agent policies are batched
+    if ProblemConfig.get('vector_envs', 1) > 1:
+        Env = VectorEnvironment
+    else:
+        Env = Environment
 
     # Specify save dir
     time = datetime.now().strftime("%d-%m-%Y_%H-%M")
@@ -37,7 +45,7 @@ def main():
     instruction_results = None
     
     helios = HELIOS_SEARCH(Config=ExperimentConfig, LocalConfig=ProblemConfig, 
-                        Environment=Environment,
+                        Environment=Env,
                         save_dir = save_dir+'/Reinforced_Instr_Experiment',
                         num_plans = num_plans, number_exploration_episodes=num_explor_epi, sim_threshold=sim_threshold,
                         feedback_increment = 0.1, feedback_repeats=1,
@@ -51,19 +59,32 @@ def main():
     instruction_results = helios_results[1]
     # Take Instruction path now defined with reinforced+unsupervised sub-goal locations and train to these
     # Init experiment setup with sub-goal defined
-    reinforced_experiment = HELIOS_OPTIMIZE(Config=ExperimentConfig, LocalConfig=ProblemConfig, 
-                    Environment=Environment,
-                    save_dir=save_dir+'/Reinforced_Instr_Experiment', show_figures = 'No', window_size=0.1,
-                    instruction_path=None, predicted_path=instruction_results, instruction_episode_ratio=0.2)
-    reinforced_experiment.train()
-    reinforced_experiment.test()
+    # Independent repeats are spread across a process pool when more than one worker is set
+    number_workers = ExperimentConfig.get('number_workers', 1)
+    if number_workers > 1:
+        run_parallel(HELIOS_OPTIMIZE, Config=ExperimentConfig, LocalConfig=ProblemConfig, 
+                    Environment=Env,
+                    save_dir=save_dir+'/Reinforced_Instr_Experiment', number_workers=number_workers, window_size=0.1,
+                    show_figures = 'No', instruction_path=None, predicted_path=instruction_results, instruction_episode_ratio=0.2)
+    else:
+        reinforced_experiment = HELIOS_OPTIMIZE(Config=ExperimentConfig, LocalConfig=ProblemConfig, 
+                        Environment=Env,
+                        save_dir=save_dir+'/Reinforced_Instr_Experiment', show_figures = 'No', window_size=0.1,
+                        instruction_path=None, predicted_path=instruction_results, instruction_episode_ratio=0.2)
+        reinforced_experiment.train()
+        reinforced_experiment.test()
     # --------------------------------------------------------------------
     # Flat Baselines
-    flat = STANDARD_RL(Config=ExperimentConfig, LocalConfig=ProblemConfig, 
-                Environment=Environment,
-                save_dir=save_dir, show_figures = 'No', window_size=0.1)
-    flat.train()  
-    flat.test()
+    if number_workers > 1:
+        run_parallel(STANDARD_RL, Config=ExperimentConfig, LocalConfig=ProblemConfig, 
+                    Environment=Env,
+                    save_dir=save_dir, number_workers=number_workers, window_size=0.1, show_figures = 'No')
+    else:
+        flat = STANDARD_RL(Config=ExperimentConfig, LocalConfig=ProblemConfig, 
+                    Environment=Env,
+                    save_dir=save_dir, show_figures = 'No', window_size=0.1)
+        flat.train()  
+        flat.test()
     # --------------------------------------------------------------------
     # --------------------------------------------------------------------
     # Combined results visual analysis
@@ -0,0 +1,157 @@
+import os
+import re
+import glob
+import shutil
+import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from environment.worker_init import init_worker
+
+# Runs the training/testing repeats of a HELIOS experiment (e.g. STANDARD_RL) across a process pool.
+# - Every worker runs a single training repeat with its own deterministic seed in save_dir/repeat_<n>
+# - Per-repeat results folders are then merged into save_dir with the same names and
+#   training/testing_variance_results.csv layout as the sequential path
+
+
+def repeat_seed(base_seed: int, repeat: int) -> int:
+    """Deterministic seed for a repeat."""
+    return base_seed + repeat
+
+
+def _run_repeat(task: dict) -> str:
+    """Train (and test) a single repeat in a worker process."""
+    import torch
+    seed = task['seed']
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+    Config = dict(task['Config'])
+    Config['number_training_repeats'] = 1
+    Config['number_test_repeats'] = max(1, task['test_repeats'])
+    experiment = task['Experiment'](Config=Config, LocalConfig=task['LocalConfig'],
+                                    Environment=task['Environment'], save_dir=task['repeat_dir'],
+                                    **task['experiment_kwargs'])
+    experiment.train()
+    if task['test_repeats'] > 0:
+        experiment.test()
+    return task['repeat_dir'], _results_agents(task['repeat_dir'], Config, task['LocalConfig'])
+
+
+def _results_agents(repeat_dir: str, Config: dict, LocalConfig: dict) -> dict:
+    """Agent/adapter ('<agent>_<adapter>') of each results folder of a repeat, keyed by its path relative to repeat_dir.
+       Folders are named '<agent>_<adapter>__<phase>_results...', the longest configured name matching wins."""
+    adapters = LocalConfig.get('adapter_select', [])
+    adapters = [adapters] if isinstance(adapters, str) else adapters
+    agent_adapters = sorted([agent + '_' + adapter for agent in Config.get('agent_select', []) for adapter in adapters],
+                            key=len, reverse=True)
+    agents = {}
+    for folder in glob.glob(os.path.join(repeat_dir, '**', '*_results_*'), recursive=True):
+        folder_name = os.path.basename(folder)
+        for agent_adapter in agent_adapters:
+            if folder_name.startswith(agent_adapter + '__'):
+                agents[os.path.relpath(folder, repeat_dir)] = agent_adapter
+                break
+    return agents
+
+
+def _renumber(folder_name: str, offset: int) -> str:
+    """Shift the trailing repeat number of a results folder, e.g. '..._training_results_1' -> '..._training_results_3'."""
+    match = re.match(r"^(.*_)(\d+)$", folder_name)
+    return match.group(1) + str(int(match.group(2)) + offset)
+
+
+def _agent_name(agent_adapter: str, phase: str) -> str:
+    """Agent label written by the sequential variance results for an '<agent>_<adapter>' run, e.g. for 'Qlearntab_Engine'
+       training -> 'Qlearntab_Engine__training_results', testing -> 'Qlearntab' (its last '_' field is dropped)."""
+    if phase == 'testing':
+        return '_'.join(agent_adapter.split('_')[:-1])
+    return agent_adapter + '__training_results'
+
+
+def variance_results(results: list, agent: str, window_size: float) -> pd.DataFrame:
+    """Per-episode mean/standard error (median time) across repeats, same layout as the sequential variance results."""
+    num_repeats = len(results)
+    num_episodes = min([len(df) for df in results])
+    window = max(1, int(window_size*num_episodes))
+    avg_R = np.stack([df['episode_reward'].iloc[:num_episodes].rolling(window, min_periods=1).mean().shift(1).values for df in results])
+    cum_R = np.stack([df['cumulative_reward'].iloc[:num_episodes].values for df in results])
+    time_per_episode = np.stack([df['time_per_episode'].iloc[:num_episodes].values for df in results])
+    se = lambda x: x.std(axis=0, ddof=1)/np.sqrt(num_repeats) if num_repeats > 1 else np.zeros(x.shape[1])
+    return pd.DataFrame({'agent': agent,
+                         'num_repeats': num_repeats,
+                         'episode': np.arange(num_episodes),
+                         'avg_R_mean': avg_R.mean(axis=0),
+                         'avg_R_se': se(avg_R),
+                         'cum_R_mean': cum_R.mean(axis=0),
+                         'cum_R_se': se(cum_R),
+                         'time_mean': np.median(time_per_episode, axis=0)})
+
+
+def merge_repeats(save_dir: str, repeat_results: list, window_size: float = 0.1):
+    """Move per-repeat results folders into save_dir and write the variance results for each phase.
+       repeat_results are the (repeat_dir, {results folder: '<agent>_<adapter>'}) returned by the workers.
+       Sub-directories made by the experiment (e.g. 'Standard_Experiment') are kept."""
+    repeat_dirs = [repeat_dir for repeat_dir, agents in repeat_results]
+    for phase in ['training', 'testing']:
+        # {sub_dir: (agent, [results])}
+        merged = {}
+        for repeat_dir, agents in repeat_results:
+            folders = sorted(glob.glob(os.path.join(repeat_dir, '**', '*_'+phase+'_results_*'), recursive=True))
+            offsets = {}
+            for folder in folders:
+                sub_dir = os.path.relpath(os.path.dirname(folder), repeat_dir)
+                agent_adapter = agents.get(os.path.relpath(folder, repeat_dir), None)
+                if agent_adapter is None:
+                    raise ValueError(f"results folder {folder!r} does not match any configured agent and adapter")
+                agent, results = merged.setdefault(sub_dir, (_agent_name(agent_adapter, phase), []))
+                folder_name = _renumber(os.path.basename(folder), len(results) - offsets.setdefault(sub_dir, 0))
+                offsets[sub_dir] += 1
+                os.makedirs(os.path.join(save_dir, sub_dir), exist_ok=True)
+                shutil.move(folder, os.path.join(save_dir, sub_dir, folder_name))
+                results_csv = os.path.join(save_dir, sub_dir, folder_name, 'results.csv')
+                df = pd.read_csv(results_csv, index_col=0)
+                if 'Repeat' in df.columns:
+                    df['Repeat'] = int(folder_name.split('_')[-1])
+                    df.to_csv(results_csv)
+                results.append(df)
+        for sub_dir, (agent, results) in merged.items():
+            variance_results(results, agent, window_size).to_csv(os.path.join(save_dir, sub_dir, phase+'_variance_results.csv'))
+    # Other experiment outputs (e.g. instruction predictions) are kept from the first repeat
+    if len(repeat_dirs) > 0:
+        for path in glob.glob(os.path.join(repeat_dirs[0], '**', '*'), recursive=True):
+            target = os.path.join(save_dir, os.path.relpath(path, repeat_dirs[0]))
+            if os.path.isfile(path) and not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+    for repeat_dir in repeat_dirs:
+        shutil.rmtree(repeat_dir, ignore_errors=True)
+
+
+def run_parallel(Experiment, Config: dict, LocalConfig: dict, Environment, save_dir: str,
+                 number_workers: int = None, base_seed: int = 0, window_size: float = 0.1, **experiment_kwargs):
+    """Run the configured training/testing repeats of an experiment class in parallel.
+       Test repeats are shared round-robin between the trained repeats."""
+    number_repeats = Config['number_training_repeats']
+    number_test_repeats = Config['number_test_repeats']
+    cpu_count = os.cpu_count() or 1
+    number_workers = min(number_workers or cpu_count, number_repeats)
+    threads_per_worker = max(1, cpu_count//number_workers)
+
+    os.makedirs(save_dir, exist_ok=True)
+    tasks = []
+    for repeat in range(number_repeats):
+        tasks.append({'Experiment': Experiment, 'Config': Config, 'LocalConfig': LocalConfig, 'Environment': Environment,
+                      'repeat_dir': os.path.join(save_dir, 'repeat_'+str(repeat)),
+                      'seed': repeat_seed(base_seed, repeat),
+                      'test_repeats': number_test_repeats//number_repeats + int(repeat < number_test_repeats % number_repeats),
+                      'experiment_kwargs': dict(experiment_kwargs, window_size=window_size)})
+
+    with ProcessPoolExecutor(max_workers=number_workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=init_worker, initargs=(threads_per_worker,)) as pool:
+        repeat_results = list(pool.map(_run_repeat, tasks))
+
+    merge_repeats(save_dir, repeat_results, window_size)
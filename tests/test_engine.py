@@ -0,0 +1,104 @@
+import random
+import numpy as np
+import pytest
+import chess
+import chess.polyglot
+
+from adapters.adapter_abstract import ACTION_INDEX, ACTION_MOVES, ACTION_UCI, NUM_ACTIONS
+from environment.engine import Engine
+
+# Lines that reach the special cases of the incremental Zobrist update
+CASTLING = ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'g8f6', 'e1g1', 'f8c5', 'd2d3', 'e8g8']
+EN_PASSANT = ['e2e4', 'a7a6', 'e4e5', 'd7d5', 'e5d6']
+PROMOTION = ['a2a4', 'b7b5', 'a4b5', 'a7a6', 'b5a6', 'c8b7', 'a6b7', 'g8f6', 'b7a8q']
+CAPTURE_PROMOTION = ['a2a4', 'b7b5', 'a4b5', 'a7a6', 'b5a6', 'c8b7', 'a6b7', 'g8f6', 'b7a8n']
+FOOLS_MATE = ['f2f3', 'e7e5', 'g2g4', 'd8h4']
+
+
+def assert_matches_board(engine: Engine):
+    """Running state of the engine against values recomputed from its chess.Board."""
+    board = engine.board
+    assert engine.position_key == chess.polyglot.zobrist_hash(board)
+    assert engine.piece_type_total == sum([piece.piece_type for piece in board.piece_map().values()])
+    outcome = board.outcome()
+    assert engine.terminated == (outcome is not None)
+    assert engine.result == (outcome.result() if outcome is not None else '*')
+    expected_mask = np.zeros(NUM_ACTIONS, dtype=bool)
+    expected_mask[[ACTION_INDEX[move.uci()] for move in board.legal_moves]] = True
+    assert np.array_equal(engine.legal_move_mask(), expected_mask)
+    assert engine.legal_moves() == list(board.legal_moves)
+    assert engine.legal_move_generator() == ([move.uci() for move in board.legal_moves] or [''])
+
+
+def play_line(engine: Engine, line: list):
+    engine.reset()
+    for move_uci in line:
+        engine.step(state=None, action=move_uci)
+        assert_matches_board(engine)
+
+
+def test_action_table_round_trip():
+    assert NUM_ACTIONS == 1968
+    assert len(set(ACTION_UCI.tolist())) == NUM_ACTIONS
+    for action_id, move_uci in enumerate(ACTION_UCI.tolist()):
+        assert ACTION_INDEX[move_uci] == action_id
+        assert ACTION_MOVES[action_id].uci() == move_uci
+
+
+@pytest.mark.parametrize('line', [CASTLING, EN_PASSANT, PROMOTION, CAPTURE_PROMOTION, FOOLS_MATE])
+def test_special_moves(line):
+    play_line(Engine(), line)
+
+
+def test_checkmate_result():
+    engine = Engine()
+    play_line(engine, FOOLS_MATE)
+    assert engine.terminated
+    assert engine.result == '0-1'
+    assert engine.goal_reached(sub_goal=None, action_num=0, action_cap=10)
+
+
+def test_random_games():
+    rng = random.Random(0)
+    engine = Engine()
+    for _ in range(20):
+        engine.reset()
+        assert_matches_board(engine)
+        while not engine.terminated and engine.board.ply() < 200:
+            engine.step_move(rng.randrange(len(engine.legal_moves())))
+            assert_matches_board(engine)
+
+
+def test_illegal_move():
+    engine = Engine()
+    engine.reset()
+    with pytest.raises(chess.IllegalMoveError):
+        engine.step(state=None, action='e2e5')
+    assert_matches_board(engine)
+
+
+def test_push_pop_restore():
+    rng = random.Random(1)
+    engine = Engine()
+    engine.reset()
+    for move_uci in EN_PASSANT[:-1]:
+        engine.push(chess.Move.from_uci(move_uci))
+    for _ in range(10):
+        fen = engine.board.fen()
+        key = engine.position_key
+        legal_moves = list(engine.legal_moves())
+        snapshot = engine.snapshot()
+        pushed = []
+        while len(pushed) < 30 and not engine.terminated:
+            pushed.append(engine.legal_moves()[rng.randrange(len(engine.legal_moves()))])
+            engine.push(pushed[-1])
+        assert engine.pop() == pushed[-1]
+        assert_matches_board(engine)
+        engine.restore(snapshot)
+        assert engine.snapshot() == snapshot
+        assert engine.board.fen() == fen
+        assert engine.position_key == key
+        assert engine.legal_moves() == legal_moves
+        assert_matches_board(engine)
+        # Continue from a different position for the next line
+        engine.push(rng.randrange(len(legal_moves)))
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+import chess
+
+from adapters.adapter_abstract import ACTION_INDEX, fen_position_key
+from environment.opponent_agents.opening_book import OpeningBook
+
+START_FEN = chess.STARTING_FEN
+E4_FEN = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
+D4_FEN = 'rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq - 0 1'
+NF3_FEN = 'rnbqkbnr/pppppppp/8/8/8/5N2/PPPPPPPP/RNBQKB1R b KQkq - 1 1'
+# Zero counts at the start, middle and end of rows and a row with only zero counts
+MOVE_COUNTS = {
+    START_FEN: {'a2a3': 0, 'e2e4': 5, 'b2b3': 0, 'd2d4': 3, 'h2h3': 0},
+    E4_FEN: {'e7e5': 2, 'c7c5': 0, 'e7e6': 1},
+    D4_FEN: {'d7d5': 0, 'g8f6': 0},
+    NF3_FEN: {'d7d5': 1},
+}
+
+
+@pytest.fixture
+def book():
+    return OpeningBook.from_move_counts(MOVE_COUNTS)
+
+
+def test_moves(book):
+    for board_fen, moves in MOVE_COUNTS.items():
+        actions, counts = book.moves(fen_position_key(board_fen))
+        assert actions.tolist() == [ACTION_INDEX[move_uci] for move_uci in moves]
+        assert counts.tolist() == list(moves.values())
+    assert book.moves(fen_position_key('8/8/8/8/8/8/8/K6k w - - 0 1')) is None
+
+
+def test_totals(book):
+    rows = book.find_batch([fen_position_key(board_fen) for board_fen in MOVE_COUNTS] + [0])
+    assert rows[-1] == -1
+    assert book.totals(rows).tolist() == [sum(moves.values()) for moves in MOVE_COUNTS.values()] + [0]
+
+
+def test_sample_actions_draw_bounds(book):
+    """Every draw in 1..total picks a move of that row with a non-zero count, each move picked count times."""
+    for board_fen, moves in MOVE_COUNTS.items():
+        row = book.find(fen_position_key(board_fen))
+        total = int(book.totals([row])[0])
+        if total == 0:
+            continue
+        draws = np.arange(1, total+1)
+        picked = book.sample_actions(np.full(total, row), draws).tolist()
+        expected = [ACTION_INDEX[move_uci] for move_uci, count in moves.items() for _ in range(count)]
+        assert picked == expected
+
+
+def test_positions_merged():
+    """FENs of the same position with different move counters share a row and their counts are added."""
+    book = OpeningBook.from_move_counts({START_FEN: {'e2e4': 2}, START_FEN.replace(' 0 1', ' 4 3'): {'e2e4': 1, 'd2d4': 1}})
+    assert len(book) == 1
+    actions, counts = book.moves(fen_position_key(START_FEN))
+    assert actions.tolist() == [ACTION_INDEX['e2e4'], ACTION_INDEX['d2d4']]
+    assert counts.tolist() == [3, 1]
+
+
+def test_save_load(book, tmp_path):
+    book.save(str(tmp_path))
+    loaded = OpeningBook.load(str(tmp_path))
+    for name in ['keys', 'offsets', 'actions', 'counts', 'cum_counts']:
+        assert np.array_equal(getattr(loaded, name), getattr(book, name))
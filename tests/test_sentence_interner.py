@@ -0,0 +1,43 @@
+import pytest
+
+from adapters.sentence_interner import SentenceInterner
+
+SENTENCES = ['White pawn at e2', 'Black knight at g8', 'White king at e1', 'Black queen at d8', 'White rook at h1']
+
+
+@pytest.fixture(params=['memory', 'shared'])
+def make_interner(request, tmp_path):
+    """Interners with the table in memory or in files shared by every interner of the path."""
+    path = str(tmp_path/'interner') if request.param == 'shared' else None
+    return lambda capacity: SentenceInterner(path, capacity=capacity, cache_size=2)
+
+
+def test_dense_ids(make_interner):
+    interner = make_interner(8)
+    assert interner.ids(SENTENCES) == [0, 1, 2, 3, 4]
+    # Ids do not change once given, including after cache eviction
+    assert interner.ids(list(reversed(SENTENCES))) == [4, 3, 2, 1, 0]
+    assert len(interner) == 5
+    assert interner.vocabulary() == SENTENCES
+
+
+def test_overflow(make_interner):
+    interner = make_interner(3)
+    assert interner.ids(SENTENCES) == [0, 1, 2, 3, 3]
+    assert interner.overflowed
+    assert len(interner) == 3
+    assert interner.vocabulary() == SENTENCES[:3]
+    # Sentences added before the table was full keep their ids, later ones stay on the overflow id
+    assert interner.ids(SENTENCES) == [0, 1, 2, 3, 3]
+
+
+def test_shared_table(tmp_path):
+    path = str(tmp_path/'interner')
+    first = SentenceInterner(path, capacity=8)
+    assert first.ids(SENTENCES[:3]) == [0, 1, 2]
+    # A second interner of the same path, e.g. another worker, sees the ids given and continues from them
+    second = SentenceInterner(path, capacity=4)
+    assert second.capacity == 8
+    assert second.ids(SENTENCES) == [0, 1, 2, 3, 4]
+    assert first.id(SENTENCES[4]) == 4
+    assert first.vocabulary() == SENTENCES